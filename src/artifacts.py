@@ -0,0 +1,169 @@
+"""
+Content addressed cache of compilation results.
+
+An entry is keyed by a hash of everything the result depends on: the
+source text, the sources of the compiler, the options and the runtime
+library. It holds the exit code, the messages printed, the bytes of the
+generated assembly and the routines of the runtime library linked after
+it, so a hit reproduces the whole compilation without running any phase.
+
+Nothing is cached unless asked for: COOL_ARTIFACT_CACHE names the cache
+directory, or `main.py --cache` uses src/.cache/artifacts. Entries live
+in that directory. They are evicted in least recently
+used order (their mtime is refreshed on every hit) whenever the
+directory grows over its size limit. Lifetime hits, misses, stores and
+evictions are kept in `stats.json` there.
+
+The code generated for each class (see core/visitors/mips/units.py) is
+kept apart in the `classes` folder, with its own limit and statistics,
+so a program that changed only regenerates the classes that did.
+"""
+import os
+import json
+import fcntl
+import hashlib
+
+from core.cmp.parser.cache import read_cache, write_cache
+
+# Bump this whenever the layout of the entries changes
+CACHE_VERSION = 3
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Artifacts are only cached on demand, in COOL_ARTIFACT_CACHE or (with --cache) in DEFAULT_CACHE_DIR
+DEFAULT_CACHE_DIR = os.path.join(SRC_DIR, '.cache', 'artifacts')
+CACHE_DIR = os.environ.get('COOL_ARTIFACT_CACHE') or None
+CACHE_SIZE = int(os.environ.get('COOL_ARTIFACT_CACHE_SIZE', 256 * 1024 * 1024))
+
+_compiler_version = None
+
+def compiler_version():
+    """Hash of the sources of the compiler, so editing any of them invalidates the cache"""
+    global _compiler_version
+    if _compiler_version is None:
+        sha = hashlib.sha256()
+        sources = [os.path.join(SRC_DIR, 'main.py')]
+        for root, dirs, names in os.walk(os.path.join(SRC_DIR, 'core')):
+            dirs.sort()
+            sources.extend(os.path.join(root, name) for name in sorted(names) if name.endswith('.py'))
+        for path in sources:
+            sha.update(os.path.relpath(path, SRC_DIR).encode())
+            with open(path, 'rb') as fd:
+                sha.update(fd.read())
+        _compiler_version = sha.hexdigest()
+    return _compiler_version
+
+class ArtifactCache:
+    STATS = ('hits', 'misses', 'stores', 'evictions')
+
+    def __init__(self, path, max_size=CACHE_SIZE):
+        self.path = path
+        self.max_size = max_size
+
+    def key(self, code, runtime, options=None):
+        sha = hashlib.sha256()
+        sha.update(f'{CACHE_VERSION}:{compiler_version()}:'.encode())
+        sha.update(json.dumps(options or {}, sort_keys=True).encode())
+        for text in (runtime, code):
+            data = text if isinstance(text, bytes) else text.encode('utf-8', 'surrogateescape')
+            sha.update(f'{len(data)}:'.encode())
+            sha.update(data)
+        return sha.hexdigest()
+
+    def units(self):
+        """Cache of the code generated for each class"""
+        return ArtifactCache(os.path.join(self.path, 'classes'), self.max_size)
+
+    def entry_path(self, key):
+        return os.path.join(self.path, key[:2], key)
+
+    def get(self, key):
+        """The entry stored for `key` (`(status, output, mips, routines)` for programs), None on a miss"""
+        path = self.entry_path(key)
+        entry = read_cache(path, key)
+        if entry is None:
+            self.update_stats(misses=1)
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self.update_stats(hits=1)
+        return entry
+
+    def put(self, key, entry):
+        write_cache(self.entry_path(key), key, entry)
+        self.update_stats(stores=1)
+        self.evict()
+
+    def entries(self):
+        """`(mtime, size, path)` of every entry"""
+        entries = []
+        try:
+            # Entries are spread in folders named by the first two digits of their key
+            folders = [f.path for f in os.scandir(self.path) if f.is_dir() and len(f.name) == 2]
+        except OSError:
+            return entries
+        for folder in folders:
+            try:
+                for f in os.scandir(folder):
+                    if f.is_file() and not f.name.endswith('.tmp'):
+                        stat = f.stat()
+                        entries.append((stat.st_mtime, stat.st_size, f.path))
+            except OSError:
+                pass
+        return entries
+
+    def evict(self):
+        entries = self.entries()
+        size = sum(size for _, size, _ in entries)
+        if size <= self.max_size:
+            return
+
+        evicted = 0
+        for _, entry_size, path in sorted(entries):
+            if size <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            size -= entry_size
+            evicted += 1
+        self.update_stats(evictions=evicted)
+
+    def update_stats(self, **deltas):
+        """Add `deltas` to the lifetime statistics and return them"""
+        os.makedirs(self.path, exist_ok=True)
+        with open(os.path.join(self.path, 'stats.json'), 'a+') as fd:
+            # Compilers may share the cache concurrently, hold the file meanwhile
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            fd.seek(0)
+            try:
+                stats = json.loads(fd.read())
+            except ValueError:
+                stats = {}
+            stats = { name: stats.get(name, 0) + deltas.get(name, 0) for name in self.STATS }
+            if deltas:
+                fd.seek(0)
+                fd.truncate()
+                fd.write(json.dumps(stats))
+        return stats
+
+    def stats(self):
+        stats = self.update_stats()
+        entries = self.entries()
+        stats['entries'] = len(entries)
+        stats['size'] = sum(size for _, size, _ in entries)
+        return stats
+
+    def report(self):
+        stats = self.stats()
+        lookups = stats['hits'] + stats['misses']
+        ratio = 100 * stats['hits'] / lookups if lookups else 0
+        return '\n'.join([
+            f'cache: {self.path}',
+            f'entries: {stats["entries"]} ({stats["size"] / 1024:.1f} KiB of {self.max_size / 1024:.0f} KiB)',
+            f'hits: {stats["hits"]}, misses: {stats["misses"]} ({ratio:.1f}% hit ratio)',
+            f'stores: {stats["stores"]}, evictions: {stats["evictions"]}',
+        ])
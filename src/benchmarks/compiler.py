@@ -0,0 +1,215 @@
+"""
+Compile time of synthetic programs, phase by phase.
+
+`run` sweeps the knobs of benchmarks/generator.py one at a time (the rest
+keep their defaults) and times every phase of the compilation of each
+program, through the hooks of core/timings.py. The growth of a phase
+along an axis is summed up as the exponent `k` of `time ~ size^k`
+fitted over the sizes: about 1 for a linear phase, 2 for a quadratic
+one. The results can be saved as a JSON baseline.
+
+`compare` flags the phases of a run that got slower than in a baseline,
+or that grow faster along an axis.
+
+    python -m benchmarks.compiler run -o base.json
+    python -m benchmarks.compiler compare base.json new.json
+"""
+import io
+import os
+import json
+import math
+import platform
+from sys import exit
+from contextlib import redirect_stdout
+
+from core import CoolLexer, timings
+from main import compile_source, read_runtime, write_assembly
+from .generator import DEFAULTS, generate
+
+SWEEPS = {
+    'classes': [8, 16, 32, 64],
+    'depth': [1, 4, 16, 32],
+    'attributes': [8, 64, 256, 512],
+    'methods': [2, 4, 8, 16],
+    'nesting': [8, 16, 32, 64],
+    'branches': [4, 16, 32, 64],
+    'lets': [8, 32, 64, 128],
+    'strings': [16, 64, 256, 512],
+    'autos': [4, 8, 16, 32],
+}
+
+# Inheritance chains can't be longer than the program
+DEPTH_CLASSES = 32
+
+def program(axis, size):
+    params = dict(DEFAULTS)
+    params[axis] = size
+    if axis == 'depth':
+        params['classes'] = DEPTH_CLASSES
+    return params
+
+def compile_once(code, lexer, memory):
+    records = []
+    hook = records.append
+    timings.add_hook(hook, memory)
+    try:
+        with timings.recording('benchmark'), redirect_stdout(io.StringIO()) as output:
+            status, program = compile_source(code, lexer)
+            if program is not None:
+                write_assembly(os.devnull, program, read_runtime())
+    finally:
+        timings.remove_hook(hook)
+    if status:
+        raise RuntimeError(f'the program failed to compile:\n{output.getvalue()}')
+    return records[0]
+
+def measure(code, lexer, repeat, memory):
+    """Best time of each phase (and the peaks of one more run, if `memory`)"""
+    phases = {}
+    for _ in range(repeat):
+        record = compile_once(code, lexer, False)
+        for name, data in record['phases'].items():
+            best = phases.get(name)
+            if best is None or data['time'] < best['time']:
+                phases[name] = { 'parent': data['parent'], 'time': data['time'], 'peak': None }
+    if memory:
+        # Tracing the memory slows everything down, so it gets a run of its own
+        for name, data in compile_once(code, lexer, True)['phases'].items():
+            phases[name]['peak'] = data['peak']
+    total = sum(data['time'] for data in phases.values() if data['parent'] is None)
+    return { 'phases': phases, 'total': total, 'counters': record['counters'] }
+
+def growth(points):
+    """Exponent `k` of `time ~ size^k`, fitted by least squares over the `(size, time)` points"""
+    points = [(math.log(size), math.log(time)) for size, time in points if size > 0 and time > 0]
+    if len(points) < 2:
+        return None
+    mean_x = sum(x for x, _ in points) / len(points)
+    mean_y = sum(y for _, y in points) / len(points)
+    spread = sum((x - mean_x) ** 2 for x, _ in points)
+    if not spread:
+        return None
+    return sum((x - mean_x) * (y - mean_y) for x, y in points) / spread
+
+def growths(runs):
+    """Growth of the total and of each phase along the sizes of `runs`"""
+    result = { 'total': growth([(run['size'], run['total']) for run in runs]) }
+    for name in runs[0]['phases']:
+        points = [(run['size'], run['phases'][name]['time']) for run in runs if name in run['phases']]
+        result[name] = growth(points)
+    return result
+
+def format_growth(value):
+    return '-' if value is None else f'{value:.2f}'
+
+def print_axis(axis, runs, growth):
+    names = list(runs[0]['phases'])
+    print(f'{axis}')
+    print(f'{"size":>8}{"bytes":>8}{"total":>10}' + ''.join(f'{name:>10}' for name in names))
+    for run in runs:
+        times = ''.join(f'{run["phases"][name]["time"] * 1000:>10.2f}' if name in run['phases'] else f'{"-":>10}' for name in names)
+        print(f'{run["size"]:>8}{run["bytes"]:>8}{run["total"] * 1000:>10.2f}' + times)
+    print(f'{"growth":>8}{"":>8}{format_growth(growth["total"]):>10}' + ''.join(f'{format_growth(growth.get(name)):>10}' for name in names))
+    print()
+
+def run(args):
+    lexer = CoolLexer()
+    axes = args.axis or list(SWEEPS)
+    results = {
+        'python': platform.python_version(),
+        'repeat': args.repeat,
+        'axes': {},
+    }
+    print('times in ms, growth is k in time ~ size^k\n')
+    for axis in axes:
+        sizes = args.sizes or SWEEPS[axis]
+        runs = []
+        for size in sizes:
+            params = program(axis, size)
+            code = generate(**params)
+            result = measure(code, lexer, args.repeat, args.memory)
+            runs.append({ 'size': size, 'params': params, 'bytes': len(code), **result })
+        growth = growths(runs)
+        print_axis(axis, runs, growth)
+        results['axes'][axis] = { 'growth': growth, 'runs': runs }
+
+    if args.output:
+        with open(args.output, 'w') as fd:
+            json.dump(results, fd, indent=2)
+        print(f'Baseline written to {args.output}')
+
+def compare(args):
+    with open(args.baseline) as fd:
+        baseline = json.load(fd)
+    with open(args.current) as fd:
+        current = json.load(fd)
+
+    regressions = 0
+    for axis, new in current['axes'].items():
+        old = baseline['axes'].get(axis)
+        if old is None:
+            continue
+        old_runs = { run['size']: run for run in old['runs'] }
+        print(axis)
+        for run in new['runs']:
+            base = old_runs.get(run['size'])
+            if base is None:
+                continue
+            for name, data in [('total', { 'time': run['total'] })] + list(run['phases'].items()):
+                before = base['total'] if name == 'total' else base['phases'].get(name, {}).get('time')
+                if not before:
+                    continue
+                ratio = data['time'] / before
+                slower = ratio > 1 + args.threshold and data['time'] - before > args.min_time / 1000
+                if slower or args.verbose:
+                    mark = 'REGRESSION' if slower else ''
+                    print(f'  {"size " + str(run["size"]):<12}{name:<12}{before * 1000:>10.2f}{data["time"] * 1000:>10.2f} ms{ratio:>8.2f}x  {mark}')
+                regressions += slower
+
+        # A phase that grows faster is a regression even if the small sizes hide it,
+        # as long as both sweeps are comparable and the phase isn't negligible
+        if [run['size'] for run in new['runs']] != list(old_runs):
+            continue
+        largest = new['runs'][-1]
+        for name, value in new['growth'].items():
+            before = old['growth'].get(name)
+            if value is None or before is None:
+                continue
+            if name != 'total' and largest['phases'][name]['time'] < args.min_time / 1000:
+                continue
+            steeper = value - before > args.growth
+            if steeper or args.verbose:
+                mark = 'REGRESSION' if steeper else ''
+                print(f'  {"growth":<12}{name:<12}{before:>10.2f}{value:>10.2f}   {value - before:>+8.2f}   {mark}')
+            regressions += steeper
+
+    print(f'{regressions} regressions')
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Compile time benchmark over synthetic programs')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help='time the phases along the sweeps')
+    run_parser.add_argument('-a', '--axis', action='append', choices=list(SWEEPS), help='axis to sweep (all by default, may be repeated)')
+    run_parser.add_argument('-s', '--sizes', type=int, nargs='+', help='sizes to sweep instead of the default ones')
+    run_parser.add_argument('-r', '--repeat', type=int, default=3, help='compilations per program, the best one is kept')
+    run_parser.add_argument('-m', '--memory', action='store_true', help='measure the memory peak of each phase too')
+    run_parser.add_argument('-o', '--output', type=str, help='file to save the results to, as a baseline')
+
+    compare_parser = commands.add_parser('compare', help='flag the regressions of a run against a baseline')
+    compare_parser.add_argument('baseline', type=str)
+    compare_parser.add_argument('current', type=str)
+    compare_parser.add_argument('-t', '--threshold', type=float, default=0.2, help='slowdown ratio above which a phase regressed')
+    compare_parser.add_argument('--min-time', type=float, default=1.0, help='ignore slowdowns below this many ms')
+    compare_parser.add_argument('-g', '--growth', type=float, default=0.25, help='growth exponent increase above which a phase regressed')
+    compare_parser.add_argument('-v', '--verbose', action='store_true', help='print every phase, not only the regressions')
+
+    args = parser.parse_args()
+    if args.command == 'run':
+        run(args)
+    else:
+        exit(compare(args))
@@ -0,0 +1,116 @@
+"""
+Synthetic COOL programs whose size can be tuned along several axes.
+
+The programs are well typed, so they go through every phase of the
+compiler. Each knob grows one feature and leaves the rest alone:
+
+- `classes`: classes in the program, in inheritance chains of `depth`
+- `attributes`: attributes per class, each initialized from the previous
+  one (the methods use the last one)
+- `methods`: methods per class, each calling the previous one and a
+  method of the parent class
+- `nesting`: depth of the expression in the body of every method
+- `branches`: branches of a `case` in every class, over as many classes
+- `lets`: variables of a `let` chain in every class
+- `strings`: string literals used by every class
+- `autos`: methods typed AUTO_TYPE in a chain, each inferred from the
+  previous one (one more pass of the inference each)
+"""
+
+DEFAULTS = {
+    'classes': 8,
+    'depth': 2,
+    'attributes': 1,
+    'methods': 4,
+    'nesting': 4,
+    'branches': 4,
+    'lets': 4,
+    'strings': 4,
+    'autos': 0,
+}
+
+def expression(level, leaf):
+    # The expression grows linearly with the nesting, cycling through its kinds
+    if level == 0:
+        return leaf
+    inner = expression(level - 1, leaf)
+    kind = level % 4
+    if kind == 0:
+        return f'({inner} + {level})'
+    if kind == 1:
+        return f'(if x < {level} then {inner} else x fi)'
+    if kind == 2:
+        return f'{{ x <- x * 2; {inner}; }}'
+    return f'(let y : Int <- {inner} in y - {level})'
+
+def generate(classes=8, depth=2, attributes=1, methods=4, nesting=4, branches=4, lets=4, strings=4, autos=0):
+    lines = []
+    depth = max(1, depth)
+
+    for i in range(classes):
+        parent = f'C{i - 1}' if i % depth else 'IO'
+        lines.append(f'class C{i} inherits {parent} {{')
+        lines.append(f'    a{i} : Int <- {i};')
+        last = f'a{i}'
+        for j in range(1, attributes):
+            lines.append(f'    a{i}_{j} : Int <- {last} + {j};')
+            last = f'a{i}_{j}'
+
+        for k in range(methods):
+            calls = [last]
+            if k:
+                calls.append(f'm{i}_{k - 1}(x)')
+            if i % depth and methods:
+                calls.append(f'm{i - 1}_{methods - 1}(x)')
+            leaf = ' + '.join(calls)
+            lines.append(f'    m{i}_{k}(x : Int) : Int {{ {expression(nesting, leaf)} }};')
+
+        if branches:
+            lines.append(f'    c{i}(o : Object) : Int {{ case o of')
+            for b in range(branches):
+                lines.append(f'        k{b} : K{b} => {b};')
+            lines.append('        o : Object => 0;')
+            lines.append('    esac };')
+
+        if lets:
+            chain = ', '.join([f'v0 : Int <- x'] + [f'v{j} : Int <- v{j - 1} + {j}' for j in range(1, lets)])
+            lines.append(f'    l{i}(x : Int) : Int {{ let {chain} in v{lets - 1} }};')
+
+        if strings:
+            literals = ' '.join(f'out_string("class {i} string {j}\\n");' for j in range(strings))
+            lines.append(f'    s{i}() : Object {{ {{ {literals} }} }};')
+
+        lines.append('};')
+        lines.append('')
+
+    for b in range(branches):
+        lines.append(f'class K{b} {{ }};')
+    if branches:
+        lines.append('')
+
+    if autos:
+        lines.append('class Auto {')
+        lines.append('    a0(x : Int) : AUTO_TYPE { x + 1 };')
+        for k in range(1, autos):
+            lines.append(f'    a{k}(x : Int) : AUTO_TYPE {{ a{k - 1}(x) }};')
+        lines.append('};')
+        lines.append('')
+
+    lines.append('class Main inherits IO {')
+    if classes:
+        lines.append(f'    main() : Object {{ new C{classes - 1} }};')
+    else:
+        lines.append('    main() : Object { out_string("empty\\n") };')
+    lines.append('};')
+    return '\n'.join(lines) + '\n'
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Synthetic COOL program generator')
+    for name, default in DEFAULTS.items():
+        parser.add_argument(f'--{name}', type=int, default=default, help=f'default {default}')
+
+    args = parser.parse_args()
+    print(generate(**vars(args)), end='')
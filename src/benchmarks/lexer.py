@@ -0,0 +1,77 @@
+import time
+
+from core import CoolLexer
+from core.lexer.lex import BACKENDS
+from .parser import load_code
+
+class RfindLexer(CoolLexer):
+    """Lexer computing columns by searching the previous newline, kept as reference"""
+
+    def compute_column(self, token):
+        line_start = self.text.rfind('\n', 0, token.lexpos) + 1
+        return (token.lexpos - line_start) + 1
+
+class CharacterLexer(CoolLexer):
+    """Lexer scanning strings and comments one character at a time, kept as reference"""
+
+    def __dir__(self):
+        # ply collects the rules from `dir(module)`
+        return [name for name in super().__dir__() if name not in ('t_strings_text', 't_comments_text')]
+
+def single_line(size):
+    # A whole program in one line, the worst case for searching newlines backwards
+    body = ' '.join('x <- x + 1;' for _ in range(size))
+    return f'class Main {{ x : Int; main() : Int {{ {{ {body} x; }} }}; }};'
+
+def text_heavy(size):
+    # Long string literals and comments, with a few escapes and nested comments
+    text = 'The quick brown fox jumps over the lazy dog ' * 4
+    strings = '\n'.join(f'    s{i} : String <- "{text}\\n{text}\\t";' for i in range(size))
+    comments = '\n'.join(f'(* {text}\n   (* {text} *) {text} *)' for _ in range(size))
+    return f'{comments}\nclass Main {{\n{strings}\n}};\n-- {text}\n'
+
+# Input generator, reference lexer and default sizes for each kind of input
+INPUTS = {
+    'line': (single_line, RfindLexer, [1000, 4000, 16000]),
+    'text': (text_heavy, CharacterLexer, [100, 400, 800]),
+    'tests': (load_code, CoolLexer, [1, 4, 16]),
+}
+
+def measure(label, lexer, code):
+    start = time.perf_counter()
+    tokens = lexer.tokenize(code)
+    elapsed = time.perf_counter() - start
+    print(f'{label:>10}: {len(code):9d} chars {elapsed:8.3f}s {len(tokens) / elapsed:12,.0f} tokens/s')
+    return tokens
+
+def measure_build(backend, repeat=20):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        CoolLexer(backend)
+    elapsed = (time.perf_counter() - start) / repeat
+    print(f'{backend:>10}: {elapsed * 1000:8.3f}ms per CoolLexer()')
+
+def main(args):
+    generator, reference, sizes = INPUTS[args.input]
+    backends = args.backends or BACKENDS
+    for backend in backends:
+        measure_build(backend)
+    for size in args.sizes or sizes:
+        code = generator(size)
+        results = [measure(backend, CoolLexer(backend), code) for backend in backends]
+        if args.reference:
+            results.append(measure('reference', reference(), code))
+        expected = [(t.lex, t.row, t.column) for t in results[0]]
+        assert all([(t.lex, t.row, t.column) for t in tokens] == expected for tokens in results[1:])
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Lexer benchmark')
+    parser.add_argument('sizes', nargs='*', type=int, help='statements, strings or comments in the input')
+    parser.add_argument('-i', '--input', choices=INPUTS, default='line', help='single line programs, programs full of strings and comments or the codegen tests')
+    parser.add_argument('-b', '--backend', dest='backends', action='append', choices=BACKENDS, help='lexer backend to measure (all by default)')
+    parser.add_argument('-r', '--reference', action='store_true', help='also tokenize with the reference lexer for the input')
+
+    args = parser.parse_args()
+    main(args)
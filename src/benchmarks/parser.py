@@ -0,0 +1,96 @@
+import os
+import time
+import tracemalloc
+
+from core import CoolLexer
+from core.cmp import CoolParser, evaluate_reverse_parse
+
+TESTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'tests', 'codegen')
+
+def reference_parse(parser, w):
+    """Parse loop over the nested dicts tables, kept as reference for the dense one"""
+    stack = [0]
+    cursor = 0
+    output = []
+    operations = []
+
+    while True:
+        state = stack[-1]
+        lookahead = w[cursor].token_type
+        if state not in parser.action or lookahead not in parser.action[state]:
+            return None, (True, w[cursor])
+
+        action, tag = list(parser.action[state][lookahead])[0]
+        if action is parser.SHIFT:
+            operations.append(parser.SHIFT)
+            stack.append(tag)
+            cursor += 1
+        elif action is parser.REDUCE:
+            operations.append(parser.REDUCE)
+            if len(tag.Right):
+                stack = stack[:-len(tag.Right)]
+            stack.append(list(parser.goto[stack[-1]][tag.Left])[0])
+            output.append(tag)
+        elif action is parser.OK:
+            return (output, operations), (False, None)
+        else:
+            raise ValueError
+
+def load_code(copies):
+    code = []
+    for name in sorted(os.listdir(TESTS_DIR)):
+        if name.endswith('.cl'):
+            with open(os.path.join(TESTS_DIR, name)) as fd:
+                code.append(fd.read())
+    return '\n'.join(code) * copies
+
+def measure(label, parse, tokens, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result, (failure, _) = parse(tokens)
+        best = min(best, time.perf_counter() - start)
+    assert not failure
+    print(f'{label:>10}: {best:8.3f}s {len(tokens) / best:12,.0f} tokens/s')
+    return best, result
+
+def replay_parse(tokens):
+    (output, operations), result = CoolParser(tokens, get_shift_reduce=True)
+    return evaluate_reverse_parse(output, operations, tokens), result
+
+def measure_ast(label, parse, tokens):
+    start = time.perf_counter()
+    parse(tokens)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    parse(tokens)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f'{label:>10}: {elapsed:8.3f}s {peak / 2**20:8.1f} MiB peak')
+
+def main(args):
+    tokens = CoolLexer().tokenize(load_code(args.copies))
+    print(f'{len(tokens)} tokens')
+
+    elapsed, result = measure('dense', lambda w: CoolParser(w, get_shift_reduce=True), tokens, args.repeat)
+    if args.reference:
+        reference_elapsed, expected = measure('dicts', lambda w: reference_parse(CoolParser, w), tokens, args.repeat)
+        assert result == expected
+        print(f'{"":>10}  speedup: {reference_elapsed / elapsed:.1f}x')
+    if args.ast:
+        measure_ast('fused', lambda w: CoolParser(w, evaluate=True), tokens)
+        measure_ast('replay', replay_parse, tokens)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Shift-reduce parse loop benchmark')
+    parser.add_argument('-n', '--copies', type=int, default=20, help='times the codegen tests are repeated in the input')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per measure, the best one is reported')
+    parser.add_argument('-r', '--reference', action='store_true', help='also parse with the dict based loop')
+    parser.add_argument('-a', '--ast', action='store_true', help='compare building the AST while parsing against replaying the parse')
+
+    args = parser.parse_args()
+    main(args)
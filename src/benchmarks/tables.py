@@ -0,0 +1,47 @@
+import time
+
+from core.cmp.cool import CoolGrammar
+from core.cmp.cool.parser import ALGORITHMS
+from core.cmp.parser.utils import build_LR1_automaton, build_LALR1_automaton
+
+# Set based automaton builders, kept as reference for the bitset engine
+REFERENCE = {
+    'lr1': build_LR1_automaton,
+    'lalr1': build_LALR1_automaton,
+}
+
+def reference(name):
+    builder = REFERENCE[name]
+
+    class ReferenceParser(ALGORITHMS[name]):
+        def _build_automaton(self, G):
+            return builder(G)
+
+    return ReferenceParser
+
+def measure(label, parser_class):
+    start = time.perf_counter()
+    parser = parser_class(CoolGrammar)
+    elapsed = time.perf_counter() - start
+
+    entries = sum(len(row) for row in parser.action.values()) + sum(len(row) for row in parser.goto.values())
+    print(f'{label:>16}: {parser.state_count:5d} states {entries:7d} entries {elapsed:8.3f}s conflicts: {not parser.ok}')
+    return elapsed
+
+def main(args):
+    for name in args.algorithms:
+        elapsed = measure(name, ALGORITHMS[name])
+        if args.reference:
+            reference_elapsed = measure(f'{name} (sets)', reference(name))
+            print(f'{"":>16}  speedup: {reference_elapsed / elapsed:.1f}x')
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Parsing tables construction benchmark')
+    parser.add_argument('algorithms', nargs='*', default=list(ALGORITHMS), help='algorithms to build the COOL tables with')
+    parser.add_argument('-r', '--reference', action='store_true', help='also build the tables with the set based builders')
+
+    args = parser.parse_args()
+    main(args)
@@ -0,0 +1,76 @@
+"""
+Thin client of the compile server (see server.py).
+
+Sends the file to compile to the server, prints back its diagnostics (and
+on stderr the traceback of a crash) and exits with the compiler's exit
+code. When no server is listening (or it fails to answer) the file is
+compiled by main.py as usual, so coolc.sh behaves the same with or
+without a server.
+
+The default socket lives in $XDG_RUNTIME_DIR, private to the user, or
+else in /tmp. Either way the client only talks to a socket owned by the
+user, another one could make it print anything and exit with any code.
+
+Keep this module light: it runs once per compiled file.
+"""
+import os
+import sys
+import json
+import stat
+import socket
+
+RUNTIME_DIR = os.environ.get('XDG_RUNTIME_DIR')
+SOCKET = os.environ.get('COOL_SERVER_SOCKET',
+    os.path.join(RUNTIME_DIR, 'coolc.sock') if RUNTIME_DIR else f'/tmp/coolc-{os.getuid()}.sock')
+MAIN = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'main.py')
+
+def is_trusted(path):
+    """Whether `path` is a socket of this user (a link to one doesn't count)"""
+    try:
+        info = os.lstat(path)
+    except OSError:
+        return False
+    return stat.S_ISSOCK(info.st_mode) and info.st_uid == os.getuid()
+
+def request(message, path=SOCKET):
+    """Send `message` to the server and return the replies, None if it didn't answer completely"""
+    if not is_trusted(path):
+        return None
+    replies = []
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.connect(path)
+            sock.sendall(json.dumps(message).encode() + b'\n')
+            with sock.makefile('rb') as stream:
+                for line in stream:
+                    replies.append(json.loads(line))
+    except (OSError, ValueError):
+        return None
+    if not replies or 'status' not in replies[-1]:
+        return None
+    return replies
+
+def main(args):
+    replies = request({ 'file': args.file, 'cwd': os.getcwd(), 'mmap': args.mmap })
+    if replies is None:
+        command = [sys.executable, MAIN, '-f', args.file] + (['-m'] if args.mmap else [])
+        sys.stdout.flush()
+        os.execv(sys.executable, command)
+
+    for reply in replies:
+        if 'output' in reply:
+            sys.stdout.write(reply['output'])
+        if 'error' in reply:
+            sys.stderr.write(reply['error'])
+    sys.exit(replies[-1]['status'])
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='CoolCompiler client')
+    parser.add_argument('-f', '--file', type=str, default='code.cl', help='file to read')
+    parser.add_argument('-m', '--mmap', action='store_true', help='read the file through a memory map')
+
+    args = parser.parse_args()
+    main(args)
@@ -1,4 +1,17 @@
-from ..parser import LR1Parser
+import os
+from ..parser import LR1Parser, LALR1Parser
 from .grammar import CoolGrammar
 
-CoolParser = LR1Parser(CoolGrammar)
+# Table construction algorithms, selected through COOL_PARSER_ALGORITHM
+ALGORITHMS = {
+    'lr1': LR1Parser,
+    'lalr1': LALR1Parser,
+}
+ALGORITHM = os.environ.get('COOL_PARSER_ALGORITHM', 'lalr1')
+
+# Parsing tables are cached on disk and only rebuilt when the grammar changes.
+# Set COOL_PARSER_CACHE to an empty string to always build them from scratch.
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache')
+CACHE_FILE = os.environ.get('COOL_PARSER_CACHE', os.path.join(CACHE_DIR, f'cool_{ALGORITHM}.tables')) or None
+
+CoolParser = ALGORITHMS[ALGORITHM](CoolGrammar, cache=CACHE_FILE)
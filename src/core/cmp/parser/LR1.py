@@ -1,12 +1,16 @@
 from .shift_reduce import ShiftReduceParser
-from .utils import build_LR1_automaton, upd_table
+from .utils import upd_table
+from .bitset import build_automaton
 
 class LR1Parser(ShiftReduceParser):
+    def _build_automaton(self, G):
+        return build_automaton(G)
+
     def _build_parsing_table(self):
         self.ok = True
         G = self.Augmented = self.G.AugmentedGrammar(True)
 
-        automaton = self.automaton = build_LR1_automaton(G)
+        automaton = self.automaton = self._build_automaton(G)
         for i, node in enumerate(automaton):
             if self.verbose: print(i, '\t', '\n\t '.join(str(x) for x in node.state), '\n')
             node.idx = i
@@ -28,3 +32,7 @@ class LR1Parser(ShiftReduceParser):
                         self.ok &= upd_table(self.action, idx, next_symbol, (ShiftReduceParser.SHIFT, node[next_symbol.Name][0].idx))
                     else:
                         self.ok &= upd_table(self.goto, idx, next_symbol, node[next_symbol.Name][0].idx)
+
+class LALR1Parser(LR1Parser):
+    def _build_automaton(self, G):
+        return build_automaton(G, merge_cores=True)
@@ -1,2 +1,2 @@
-from .LR1 import LR1Parser
+from .LR1 import LR1Parser, LALR1Parser
 from .shift_reduce import ShiftReduceParser
@@ -0,0 +1,205 @@
+from ..pycompiler import Item
+from ..automata import State
+
+class GrammarIndex:
+    """
+    Integer view of an augmented grammar.
+
+    Terminals (followed by EOF) and then non-terminals are numbered in
+    grammar order, productions are referred by their position and sets
+    of terminals are kept as bitmasks. Items are `(production, pos)`
+    pairs and item sets are dicts mapping them to their lookaheads.
+    """
+
+    def __init__(self, G):
+        self.terminals = G.terminals + [G.EOF]
+        self.symbols = self.terminals + G.nonTerminals
+        self.productions = G.Productions
+        self.eof = len(G.terminals)
+
+        ids = self.ids = { symbol: i for i, symbol in enumerate(self.symbols) }
+        self.left = [ids[p.Left] for p in self.productions]
+        self.right = [tuple(ids[s] for s in p.Right) for p in self.productions]
+        self.by_left = { ids[X]: [] for X in G.nonTerminals }
+        for i, X in enumerate(self.left):
+            self.by_left[X].append(i)
+
+        self._compute_firsts()
+        self._compute_suffixes()
+        self._closures = {}
+        self._lookaheads = {}
+
+    def is_terminal(self, symbol):
+        return symbol < len(self.terminals)
+
+    def _compute_firsts(self):
+        self.first = [1 << i for i in range(len(self.terminals))] + [0] * (len(self.symbols) - len(self.terminals))
+        self.nullable = [False] * len(self.symbols)
+
+        change = True
+        while change:
+            change = False
+            for X, right in zip(self.left, self.right):
+                first, nullable = self.first_of(right)
+                if first | self.first[X] != self.first[X]:
+                    self.first[X] |= first
+                    change = True
+                if nullable and not self.nullable[X]:
+                    self.nullable[X] = True
+                    change = True
+
+    def first_of(self, symbols):
+        first = 0
+        for symbol in symbols:
+            first |= self.first[symbol]
+            if not self.nullable[symbol]:
+                return first, False
+        return first, True
+
+    def _compute_suffixes(self):
+        # suffix[p][pos] holds FIRST and nullability of `right[p][pos:]`
+        self.suffix = []
+        for right in self.right:
+            first, nullable = 0, True
+            suffix = [(first, nullable)]
+            for symbol in reversed(right):
+                if self.nullable[symbol]:
+                    first |= self.first[symbol]
+                else:
+                    first, nullable = self.first[symbol], False
+                suffix.append((first, nullable))
+            suffix.reverse()
+            self.suffix.append(suffix)
+
+    def closure_of(self, X):
+        """
+        Items added by the closure of `X`, as `(production, spontaneous, propagates)`.
+
+        The lookaheads of each item are its spontaneous ones, plus the lookaheads
+        passed on to `X` when `propagates` is set.
+        """
+        try:
+            return self._closures[X]
+        except KeyError:
+            pass
+
+        spontaneous = { p: 0 for p in self.by_left[X] }
+        propagates = { p: True for p in self.by_left[X] }
+        pending = list(spontaneous)
+        while pending:
+            p = pending.pop()
+            right = self.right[p]
+            if not right or self.is_terminal(right[0]):
+                continue
+            first, nullable = self.suffix[p][1]
+            if nullable:
+                first |= spontaneous[p]
+            propagate = nullable and propagates[p]
+            for q in self.by_left[right[0]]:
+                try:
+                    old = spontaneous[q], propagates[q]
+                except KeyError:
+                    spontaneous[q], propagates[q] = first, propagate
+                    pending.append(q)
+                    continue
+                new = old[0] | first, old[1] or propagate
+                if new != old:
+                    spontaneous[q], propagates[q] = new
+                    pending.append(q)
+
+        closure = self._closures[X] = [(p, spontaneous[p], propagates[p]) for p in spontaneous]
+        return closure
+
+    def closure(self, kernel):
+        items = dict(kernel)
+        for (p, pos), lookaheads in kernel.items():
+            right = self.right[p]
+            if pos == len(right) or self.is_terminal(right[pos]):
+                continue
+            first, nullable = self.suffix[p][pos + 1]
+            if nullable:
+                first |= lookaheads
+            for q, spontaneous, propagates in self.closure_of(right[pos]):
+                if propagates:
+                    spontaneous |= first
+                items[q, 0] = items.get((q, 0), 0) | spontaneous
+        return items
+
+    def goto(self, items):
+        """Kernels reachable from `items` indexed by the transition symbol."""
+        kernels = {}
+        for (p, pos), lookaheads in items.items():
+            right = self.right[p]
+            if pos < len(right):
+                try:
+                    kernels[right[pos]][p, pos + 1] = lookaheads
+                except KeyError:
+                    kernels[right[pos]] = { (p, pos + 1): lookaheads }
+        return kernels
+
+    def lookaheads(self, mask):
+        try:
+            return self._lookaheads[mask]
+        except KeyError:
+            terminals = self._lookaheads[mask] = frozenset(t for i, t in enumerate(self.terminals) if mask >> i & 1)
+            return terminals
+
+    def to_items(self, items):
+        return frozenset(Item(self.productions[p], pos, self.lookaheads(mask)) for (p, pos), mask in items.items())
+
+
+def build_automaton(G, merge_cores=False):
+    """
+    Build the LR(1) automaton of `G`, or the LALR(1) one if `merge_cores` is set.
+
+    Produces the same automaton (and state numbering) than `build_LR1_automaton`
+    and `build_LALR1_automaton` working over integers and bitmasks instead.
+    """
+    assert len(G.startSymbol.productions) == 1, 'Grammar must be augmented'
+
+    index = GrammarIndex(G)
+    start_production = index.productions.index(G.startSymbol.productions[0])
+    start = { (start_production, 0): 1 << index.eof }
+
+    if merge_cores:
+        key = frozenset
+    else:
+        key = lambda kernel: frozenset(kernel.items())
+
+    start_key = key(start)
+    kernels = { start_key: start }
+    closures = {}
+    transitions = { start_key: {} }
+    pending = [start_key]
+    queued = { start_key }
+
+    while pending:
+        current = pending.pop()
+        queued.discard(current)
+        items = closures[current] = index.closure(kernels[current])
+
+        for symbol, kernel in index.goto(items).items():
+            next_key = key(kernel)
+            try:
+                known = kernels[next_key]
+            except KeyError:
+                kernels[next_key] = kernel
+                transitions[next_key] = {}
+                pending.append(next_key)
+                queued.add(next_key)
+            else:
+                if merge_cores and any(known[x] | kernel[x] != known[x] for x in kernel):
+                    kernels[next_key] = { x: known[x] | kernel[x] for x in kernel }
+                    if next_key not in queued:
+                        pending.append(next_key)
+                        queued.add(next_key)
+            transitions[current][symbol] = next_key
+
+    states = { k: State(index.to_items(closures[k]), True) for k in kernels }
+    for k, state in states.items():
+        for symbol in sorted(transitions[k]):
+            state.add_transition(index.symbols[symbol].Name, states[transitions[k][symbol]])
+
+    automaton = states[start_key]
+    automaton.set_formatter(lambda x: "")
+    return automaton
@@ -0,0 +1,83 @@
+import os
+import pickle
+import hashlib
+
+# Bump this whenever the on-disk layout of the tables changes
+TABLES_VERSION = 1
+
+def grammar_fingerprint(G, algorithm):
+    """
+    Hash identifying the parsing tables of `G`.
+
+    Only the structure of the grammar (symbols and productions,
+    in order) takes part on it. The semantic actions are rebound
+    from the live grammar when the tables are loaded, so editing
+    an attribute doesn't invalidate the cache.
+    """
+    sha = hashlib.sha256()
+    sha.update(f'{TABLES_VERSION}:{algorithm}:'.encode())
+    sha.update(G.to_json.encode())
+    return sha.hexdigest()
+
+def dump_tables(parser):
+    productions = { p: i for i, p in enumerate(parser.Augmented.Productions) }
+
+    def encode(action, tag):
+        if action == parser.REDUCE:
+            return action, productions[tag]
+        return action, tag
+
+    action = {
+        state: { symbol.Name: [encode(*x) for x in values] for symbol, values in row.items() }
+        for state, row in parser.action.items()
+    }
+    goto = {
+        state: { symbol.Name: list(values) for symbol, values in row.items() }
+        for state, row in parser.goto.items()
+    }
+    return { 'ok': parser.ok, 'action': action, 'goto': goto }
+
+def load_tables(parser, data):
+    G = parser.Augmented
+    productions = G.Productions
+    # The parser compares actions by identity, so map them back to its constants
+    actions = { x: x for x in (parser.SHIFT, parser.REDUCE, parser.OK) }
+
+    def decode(action, tag):
+        action = actions[action]
+        if action is parser.REDUCE:
+            return action, productions[tag]
+        return action, tag
+
+    parser.ok = data['ok']
+    parser.action = {
+        state: { G[name]: {decode(*x) for x in values} for name, values in row.items() }
+        for state, row in data['action'].items()
+    }
+    parser.goto = {
+        state: { G[name]: set(values) for name, values in row.items() }
+        for state, row in data['goto'].items()
+    }
+
+def read_cache(path, fingerprint):
+    try:
+        with open(path, 'rb') as fd:
+            data = pickle.load(fd)
+    except Exception:
+        return None
+    if not isinstance(data, dict) or data.get('fingerprint') != fingerprint:
+        return None
+    return data['tables']
+
+def write_cache(path, fingerprint, tables):
+    # Write on a temporary file and then rename it, so concurrent
+    # compilers never read a half-written cache
+    tmp = f'{path}.{os.getpid()}.tmp'
+    try:
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(tmp, 'wb') as fd:
+            pickle.dump({ 'fingerprint': fingerprint, 'tables': tables }, fd, pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+    except OSError:
+        try: os.remove(tmp)
+        except OSError: pass
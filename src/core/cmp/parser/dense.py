@@ -0,0 +1,61 @@
+from array import array
+from collections import Counter
+
+class DenseTables:
+    """
+    Integer indexed copy of the ACTION/GOTO tables of a ShiftReduceParser.
+
+    Terminals, non-terminals and productions are numbered and each table is
+    a flat `array` with one row per state. An action is encoded as:
+
+    - `0`: error
+    - `s + 1`: shift and go to state `s`
+    - `-(p + 1)`: reduce by production `p` (`p == accept` means accept)
+
+    Error entries of states with reduce actions are filled with the most
+    common of those reductions (the default reduction). An erroneous token
+    may trigger some extra reductions, but it is never shifted, so errors are
+    still reported on the same token.
+    """
+
+    def __init__(self, parser):
+        G = parser.Augmented
+        self.productions = G.Productions
+        self.accept = len(self.productions)
+        self.terminals = { t: i for i, t in enumerate(G.terminals + [G.EOF]) }
+        self.nonterminals = { X: i for i, X in enumerate(G.nonTerminals) }
+        self.lengths = array('i', (len(p.Right) for p in self.productions))
+        self.lefts = array('i', (self.nonterminals[p.Left] for p in self.productions))
+        self.rules = [p.attributes[0] if hasattr(p, 'attributes') else None for p in self.productions]
+        self.columns = len(self.terminals)
+        self.goto_columns = len(self.nonterminals)
+
+        productions = { p: i for i, p in enumerate(self.productions) }
+        states = 1 + max(parser.action.keys() | parser.goto.keys())
+
+        self.action = array('i', [0]) * (states * self.columns)
+        for state, row in parser.action.items():
+            base = state * self.columns
+            reductions = Counter()
+            for symbol, actions in row.items():
+                action, tag = next(iter(actions))
+                if action == parser.SHIFT:
+                    code = tag + 1
+                elif action == parser.REDUCE:
+                    code = -(productions[tag] + 1)
+                    reductions[code] += 1
+                else:
+                    code = -(self.accept + 1)
+                self.action[base + self.terminals[symbol]] = code
+
+            if reductions:
+                default = reductions.most_common(1)[0][0]
+                for i in range(base, base + self.columns):
+                    if not self.action[i]:
+                        self.action[i] = default
+
+        self.goto = array('i', [0]) * (states * self.goto_columns)
+        for state, row in parser.goto.items():
+            base = state * self.goto_columns
+            for symbol, targets in row.items():
+                self.goto[base + self.nonterminals[symbol]] = next(iter(targets))
@@ -1,49 +1,128 @@
+from .dense import DenseTables
+from .cache import grammar_fingerprint, dump_tables, load_tables, read_cache, write_cache
+
 class ShiftReduceParser:
     SHIFT = 'SHIFT'
     REDUCE = 'REDUCE'
     OK = 'OK'
 
-    def __init__(self, G, verbose=False):
+    def __init__(self, G, verbose=False, cache=None):
         self.G = G
         self.verbose = verbose
         self.action = {}
         self.goto = {}
-        self._build_parsing_table()
+        if cache is None or not self._load_parsing_table(cache):
+            self._build_parsing_table()
+            if cache is not None:
+                self._save_parsing_table(cache)
+        self.tables = DenseTables(self)
 
     def _build_parsing_table(self):
         raise NotImplementedError()
 
-    def __call__(self, w, get_shift_reduce=False):
+    @property
+    def state_count(self):
+        return len(self.action.keys() | self.goto.keys())
+
+    @property
+    def fingerprint(self):
+        return grammar_fingerprint(self.G, type(self).__name__)
+
+    def _load_parsing_table(self, path):
+        tables = read_cache(path, self.fingerprint)
+        if tables is None:
+            return False
+        self.Augmented = self.G.AugmentedGrammar(True)
+        load_tables(self, tables)
+        return True
+
+    def _save_parsing_table(self, path):
+        write_cache(path, self.fingerprint, dump_tables(self))
+
+    def __call__(self, w, get_shift_reduce=False, evaluate=False):
+        if evaluate:
+            return self.evaluate(w)
+
+        tables = self.tables
+        action, goto = tables.action, tables.goto
+        columns, goto_columns = tables.columns, tables.goto_columns
+        terminals, lengths, lefts = tables.terminals, tables.lengths, tables.lefts
+        productions, accept = tables.productions, tables.accept
+        SHIFT, REDUCE = ShiftReduceParser.SHIFT, ShiftReduceParser.REDUCE
+
         stack = [0]
-        cursor = 0
         output = []
         operations = []
 
+        w = iter(w)
+        token = next(w)
+        lookahead = terminals.get(token.token_type)
         while True:
             state = stack[-1]
-            lookahead = w[cursor].token_type
-            if self.verbose: print(stack, w[cursor:])
-
-            # Your code here!!! (Detect error)
-            if state not in self.action or lookahead not in self.action[state]:
-                return None, (True, w[cursor]) #//TODO: Build the correct error using `w[cursor]`
-
-            action, tag = list(self.action[state][lookahead])[0]
-            # Your code here!!! (Shift case)
-            if action is ShiftReduceParser.SHIFT:
-                operations.append(ShiftReduceParser.SHIFT)
-                stack.append(tag)
-                cursor += 1
-            # Your code here!!! (Reduce case)
-            elif action is ShiftReduceParser.REDUCE:
-                operations.append(ShiftReduceParser.REDUCE)
-                if len(tag.Right):
-                    stack = stack[:-len(tag.Right)]
-                stack.append(list(self.goto[stack[-1]][tag.Left])[0])
-                output.append(tag)
-            # Your code here!!! (OK case)
-            elif action is ShiftReduceParser.OK:
-                return (output if not get_shift_reduce else(output,operations)), (False, None) 
-            # Your code here!!! (Invalid case)
+            if self.verbose: print(stack, token)
+
+            code = 0 if lookahead is None else action[state * columns + lookahead]
+            if code > 0:
+                operations.append(SHIFT)
+                stack.append(code - 1)
+                token = next(w)
+                lookahead = terminals.get(token.token_type)
+            elif code < 0:
+                production = -code - 1
+                if production == accept:
+                    return (output if not get_shift_reduce else (output, operations)), (False, None)
+                operations.append(REDUCE)
+                size = lengths[production]
+                if size:
+                    del stack[-size:]
+                stack.append(goto[stack[-1] * goto_columns + lefts[production]])
+                output.append(productions[production])
+            else:
+                return None, (True, token)
+
+    def evaluate(self, w):
+        """
+        Parse `w` running the synthesized attributes of each production
+        as soon as it is reduced, returning the value of the start symbol.
+
+        As in `__call__`, `w` may be any iterable of tokens (ended by EOF),
+        it is consumed lazily so tokens can be produced while parsing.
+        """
+        tables = self.tables
+        action, goto = tables.action, tables.goto
+        columns, goto_columns = tables.columns, tables.goto_columns
+        terminals, lengths, lefts = tables.terminals, tables.lengths, tables.lefts
+        rules, accept = tables.rules, tables.accept
+
+        stack = [0]
+        values = [None]
+
+        w = iter(w)
+        token = next(w)
+        lookahead = terminals.get(token.token_type)
+        while True:
+            state = stack[-1]
+            if self.verbose: print(stack, token)
+
+            code = 0 if lookahead is None else action[state * columns + lookahead]
+            if code > 0:
+                stack.append(code - 1)
+                values.append(token)
+                token = next(w)
+                lookahead = terminals.get(token.token_type)
+            elif code < 0:
+                production = -code - 1
+                if production == accept:
+                    return values[-1], (False, None)
+                size = lengths[production]
+                if size:
+                    synteticed = values[-size - 1:]
+                    synteticed[0] = None
+                    del stack[-size:]
+                    del values[-size:]
+                    values.append(rules[production](None, synteticed))
+                else:
+                    values.append(rules[production](None, None))
+                stack.append(goto[stack[-1] * goto_columns + lefts[production]])
             else:
-                raise ValueError
+                return None, (True, token)
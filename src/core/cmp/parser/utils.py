@@ -227,3 +227,54 @@ def build_LR1_automaton(G):
 
     automaton.set_formatter(lambda x: "")
     return automaton
+
+
+def build_LALR1_automaton(G):
+    assert len(G.startSymbol.productions) == 1, 'Grammar must be augmented'
+
+    firsts = compute_firsts(G)
+    firsts[G.EOF] = ContainerSet(G.EOF)
+
+    def center(kernel):
+        return frozenset(item.Center() for item in kernel)
+
+    start_production = G.startSymbol.productions[0]
+    start_item = Item(start_production, 0, lookaheads=(G.EOF,))
+    start = frozenset([start_item])
+    start_center = center(start)
+
+    automaton = State(start, True)
+
+    # States are identified by the center of their kernel. When a kernel with a
+    # known center shows up with new lookaheads, they are merged into the existing
+    # state and the state is processed again to propagate them.
+    pending = [start_center]
+    kernels = {start_center: start}
+    visited = {start_center: automaton}
+
+    while pending:
+        current = pending.pop()
+        current_state = visited[current]
+        items = current_state.state = frozenset(closure_lr1(kernels[current], firsts))
+
+        for symbol in G.terminals + G.nonTerminals:
+            kernel = goto_lr1(items, symbol, just_kernel=True)
+            if not kernel:
+                continue
+            next_center = center(kernel)
+            try:
+                next_state = visited[next_center]
+                merged = frozenset(compress(kernels[next_center] | kernel))
+                if merged != kernels[next_center]:
+                    kernels[next_center] = merged
+                    if next_center not in pending:
+                        pending.append(next_center)
+            except KeyError:
+                kernels[next_center] = kernel
+                next_state = visited[next_center] = State(kernel, True)
+                pending.append(next_center)
+
+            current_state[symbol.Name] = [next_state]
+
+    automaton.set_formatter(lambda x: "")
+    return automaton
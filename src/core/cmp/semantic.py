@@ -1,4 +1,3 @@
-import itertools as itt
 from collections import OrderedDict
 
 class SemanticError(Exception):
@@ -34,27 +33,56 @@ class Method:
             other.param_types == self.param_types
 
 class Type:
+    # Changes with every new parent and every numbering, the numbers of the older ones are stale
+    hierarchy = 0
+
     def __init__(self, name:str='Object'):
         self.name = name
         self.attributes = []
         self.methods = {}
         self.parent = None
+        self.children = []
+        # Name -> (feature, owner, slot) of the attributes and of the methods, inherited ones
+        # included, in the order of all_attributes and all_methods (see `tables`)
+        self._tables = None
+        # (hierarchy, preorder, postorder, 2**k-th ancestors) given by Context.freeze
+        self.numbering = None
 
     def set_parent(self, parent):
         if self.parent is not None:
             raise SemanticError(f'Parent type is already set for {self.name}.')
         self.parent = parent
+        parent.children.append(self)
+        Type.hierarchy += 1
+        self.invalidate()
+
+    def invalidate(self):
+        # A type with its tables has a parent with its own, so the descendants of a type without them have none
+        if self._tables is not None:
+            self._tables = None
+            for child in self.children:
+                child.invalidate()
+
+    def tables(self):
+        if self._tables is None:
+            if self.parent is None:
+                attributes, methods = {}, {}
+            else:
+                attributes, methods = (dict(table) for table in self.parent.tables())
+            for attr in self.attributes:
+                slot = attributes[attr.name][2] if attr.name in attributes else len(attributes)
+                attributes[attr.name] = (attr, self, slot)
+            for method in self.methods.values():
+                slot = methods[method.name][2] if method.name in methods else len(methods)
+                methods[method.name] = (method, self, slot)
+            self._tables = (attributes, methods)
+        return self._tables
 
     def get_attribute(self, name:str):
         try:
-            return next(attr for attr in self.attributes if attr.name == name)
-        except StopIteration:
-            if self.parent is None:
-                raise AttributeError(f'Attribute "{name}" is not defined in {self.name}.')
-            try:
-                return self.parent.get_attribute(name)
-            except AttributeError:
-                raise AttributeError(f'Attribute "{name}" is not defined in {self.name}.')
+            return self.tables()[0][name][0]
+        except KeyError:
+            raise AttributeError(f'Attribute "{name}" is not defined in {self.name}.')
 
     def define_attribute(self, name:str, typex):
         try:
@@ -62,20 +90,16 @@ class Type:
         except AttributeError:
             attribute = Attribute(name, typex)
             self.attributes.append(attribute)
+            self.invalidate()
             return attribute
         else:
             raise SemanticError(f'Attribute "{name}" is already defined in {self.name}.')
 
     def get_method(self, name:str):
         try:
-            return self.methods[name]
+            return self.tables()[1][name][0]
         except KeyError:
-            if self.parent is None:
-                raise AttributeError(f'Method "{name}" is not defined in {self.name}.')
-            try:
-                return self.parent.get_method(name)
-            except AttributeError:
-                raise AttributeError(f'Method "{name}" is not defined in {self.name}.')
+            raise AttributeError(f'Method "{name}" is not defined in {self.name}.')
 
     def define_method(self, name:str, param_names:list, param_types:list, return_type):
         # //TODO: Remove the below if clause
@@ -90,22 +114,42 @@ class Type:
                 raise SemanticError(f'Method "{name}" already defined in {self.name} with a different signature.')
 
         method = self.methods[name] = Method(name, param_names, param_types, return_type)
+        self.invalidate()
         return method
 
     def all_attributes(self, clean=True):
-        plain = OrderedDict() if self.parent is None else self.parent.all_attributes(False)
-        for attr in self.attributes:
-            plain[attr.name] = (attr, self)
+        plain = OrderedDict((name, (attr, owner)) for name, (attr, owner, _) in self.tables()[0].items())
         return plain.values() if clean else plain
 
     def all_methods(self, clean=True):
-        plain = OrderedDict() if self.parent is None else self.parent.all_methods(False)
-        for method in self.methods.values():
-            plain[method.name] = (method, self)
+        plain = OrderedDict((name, (method, owner)) for name, (method, owner, _) in self.tables()[1].items())
         return plain.values() if clean else plain
 
+    def numbered(self):
+        return self.numbering is not None and self.numbering[0] == Type.hierarchy
+
+    def encloses(self, other):
+        # Whether self is other or one of its ancestors, both numbered
+        return self.numbering[1] <= other.numbering[1] and other.numbering[2] <= self.numbering[2]
+
+    def common_ancestor(self, other):
+        # The deepest type both conform to, both numbered, None if they are in different trees
+        if self.encloses(other):
+            return self
+        node = self
+        for k in reversed(range(len(self.numbering[3]))):
+            ancestors = node.numbering[3]
+            if k < len(ancestors) and not ancestors[k].encloses(other):
+                node = ancestors[k]
+        return node.parent
+
     def conforms_to(self, other):
-        return other.bypass() or self == other or self.parent is not None and self.parent.conforms_to(other)
+        if other.bypass():
+            return True
+        mine, theirs = self.numbering, other.numbering
+        if mine is not None and theirs is not None and mine[0] == theirs[0] == Type.hierarchy:
+            return theirs[1] <= mine[1] and mine[2] <= theirs[2]
+        return self == other or self.parent is not None and self.parent.conforms_to(other)
 
     def bypass(self):
         if self.name == 'Object':
@@ -232,6 +276,31 @@ class Context:
         except KeyError:
             raise TypeError(f'Type "{name}" is not defined.')
 
+    def freeze(self):
+        """Number the class tree as it is, any later change to it makes the numbers stale"""
+        Type.hierarchy += 1
+        counter = 0
+        for root in self.types.values():
+            if root.parent is not None:
+                continue
+            pending = [(root, False)]
+            while pending:
+                typex, done = pending.pop()
+                if done:
+                    typex.numbering = (Type.hierarchy, typex.numbering[1], counter, typex.numbering[3])
+                    counter += 1
+                    continue
+                ancestors = []
+                ancestor = typex.parent
+                while ancestor is not None:
+                    ancestors.append(ancestor)
+                    jumps = ancestor.numbering[3]
+                    ancestor = jumps[len(ancestors) - 1] if len(ancestors) - 1 < len(jumps) else None
+                typex.numbering = (None, counter, None, ancestors)
+                counter += 1
+                pending.append((typex, True))
+                pending.extend((child, False) for child in reversed(typex.children))
+
     def __str__(self):
         return '{\n\t' + '\n\t'.join(y for x in self.types.values() for y in str(x).split('\n')) + '\n}'
 
@@ -246,6 +315,8 @@ class VariableInfo:
 class Scope:
     def __init__(self, parent=None):
         self.locals = []
+        # Name -> (position, info) of its first definition, the one lookups find
+        self.names = {}
         self.parent = parent
         self.children = []
         self.index = 0 if parent is None else len(parent)
@@ -260,21 +331,28 @@ class Scope:
 
     def define_variable(self, vname, vtype):
         info = VariableInfo(vname, vtype)
+        self.names.setdefault(vname, (len(self.locals), info))
         self.locals.append(info)
         return info
 
     def find_variable(self, vname, index=None):
-        locals = self.locals if index is None else itt.islice(self.locals, index)
-        try:
-            return next(x for x in locals if x.name == vname)
-        except StopIteration:
-            return self.parent.find_variable(vname, self.index) if self.parent is not None else None
+        # A child sees the variables its parent had when it was created, the first `index` ones
+        scope = self
+        while scope is not None:
+            try:
+                position, info = scope.names[vname]
+                if index is None or position < index:
+                    return info
+            except KeyError:
+                pass
+            index, scope = scope.index, scope.parent
+        return None
 
     def is_defined(self, vname):
         return self.find_variable(vname) is not None
 
     def is_local(self, vname):
-        return any(True for x in self.locals if x.name == vname)
+        return vname in self.names
 
     def count_auto(self):
         num = sum([x.type.name == 'AUTO_TYPE' for x in self.locals])
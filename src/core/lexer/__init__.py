@@ -1 +1 @@
-from .lex import CoolLexer
+from .lex import CoolLexer, read_source
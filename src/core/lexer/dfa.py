@@ -0,0 +1,557 @@
+import re
+import hashlib
+import itertools
+
+from ..cmp.automata import State
+from ..cmp.parser.cache import read_cache, write_cache
+
+# Bump this whenever the on-disk layout of the tables changes
+TABLES_VERSION = 1
+
+class LexError(Exception):
+    pass
+
+class LexToken:
+    def __repr__(self):
+        return f'LexToken({self.type},{self.value!r},{self.lineno},{self.lexpos})'
+
+class CharSet:
+    """
+    Set of characters matched by a regex atom: the characters in `chars`
+    (plus the unicode decimal digits when `digits` is set), or every other
+    character if `negated` is set.
+    """
+
+    def __init__(self, chars=(), digits=False, negated=False):
+        self.chars = frozenset(chars)
+        self.digits = digits
+        self.negated = negated
+
+    def __contains__(self, c):
+        return (c in self.chars or (self.digits and c.isdecimal())) != self.negated
+
+    def __eq__(self, other):
+        return self.key == other.key
+
+    def __hash__(self):
+        return hash(self.key)
+
+    @property
+    def key(self):
+        return (self.chars, self.digits, self.negated)
+
+class RegexParser:
+    """
+    Parser for the subset of `re` syntax used by the token rules: literals,
+    escapes, `.`, `\\d`, classes with ranges, groups, `|`, `*`, `+` and `?`.
+
+    Produces a tree of tuples: `('set', CharSet)`, `('cat', [nodes])`,
+    `('alt', [nodes])` and `(op, node)` with `op` in `*+?`.
+    """
+
+    ESCAPES = { 'n': '\n', 't': '\t', 'f': '\f', 'r': '\r', 'v': '\v', 'a': '\a', '0': '\0' }
+
+    def __init__(self, pattern):
+        self.pattern = pattern
+        self.pos = 0
+
+    def error(self, message):
+        return ValueError(f'Unsupported regular expression {self.pattern!r}: {message} at {self.pos}')
+
+    def peek(self):
+        return self.pattern[self.pos] if self.pos < len(self.pattern) else None
+
+    def next(self):
+        if self.pos == len(self.pattern):
+            raise self.error('unexpected end')
+        c = self.pattern[self.pos]
+        self.pos += 1
+        return c
+
+    def parse(self):
+        node = self.alternation()
+        if self.pos != len(self.pattern):
+            raise self.error('unbalanced parenthesis')
+        return node
+
+    def alternation(self):
+        options = [self.concatenation()]
+        while self.peek() == '|':
+            self.pos += 1
+            options.append(self.concatenation())
+        return options[0] if len(options) == 1 else ('alt', options)
+
+    def concatenation(self):
+        items = []
+        while self.peek() is not None and self.peek() not in '|)':
+            items.append(self.repetition())
+        return items[0] if len(items) == 1 else ('cat', items)
+
+    def repetition(self):
+        node = self.atom()
+        while self.peek() is not None and self.peek() in '*+?':
+            node = (self.next(), node)
+            if self.peek() == '?':
+                raise self.error('lazy quantifier')
+        return node
+
+    def atom(self):
+        c = self.next()
+        if c == '(':
+            if self.pattern.startswith('?:', self.pos):
+                self.pos += 2
+            elif self.peek() == '?':
+                raise self.error('group extension')
+            node = self.alternation()
+            if self.next() != ')':
+                raise self.error('unbalanced parenthesis')
+            return node
+        if c == '[':
+            return ('set', self.charclass())
+        if c == '.':
+            return ('set', CharSet('\n', negated=True))
+        if c == '\\':
+            return ('set', self.escape())
+        if c in '^$':
+            raise self.error('anchor')
+        if c in '*+?':
+            raise self.error('nothing to repeat')
+        if c == '{' and (self.peek() or '').isdigit():
+            raise self.error('counted repetition')
+        return ('set', CharSet(c))
+
+    def escape(self):
+        c = self.next()
+        if c == 'd':
+            return CharSet(digits=True)
+        if c in self.ESCAPES:
+            return CharSet(self.ESCAPES[c])
+        if c.isalnum():
+            raise self.error(f'escape \\{c}')
+        return CharSet(c)
+
+    def charclass(self):
+        negated = self.peek() == '^'
+        if negated:
+            self.pos += 1
+        chars, digits = set(), False
+        first = True
+        while first or self.peek() != ']':
+            first = False
+            c = self.next()
+            if c == '\\':
+                item = self.escape()
+                if item.digits:
+                    digits = True
+                    continue
+                c, = item.chars
+            if self.peek() == '-' and self.pattern[self.pos + 1:self.pos + 2] not in ('', ']'):
+                self.pos += 1
+                end = self.next()
+                if end == '\\':
+                    end, = self.escape().chars
+                chars.update(chr(x) for x in range(ord(c), ord(end) + 1))
+            else:
+                chars.add(c)
+        self.pos += 1
+        return CharSet(chars, digits, negated)
+
+def charsets(node):
+    if node[0] == 'set':
+        yield node[1]
+    elif node[0] in ('cat', 'alt'):
+        for child in node[1]:
+            yield from charsets(child)
+    else:
+        yield from charsets(node[1])
+
+def collect_rules(module):
+    """
+    Token rules of a ply-style lexer `module`, split by lexer state.
+
+    Follows the conventions of `ply.lex`: `t_<states>_<name>` attributes,
+    function rules in definition order followed by string rules by
+    decreasing regex length, inclusive states extended with the INITIAL
+    rules, and `error`, `eof` and `ignore` entries per state.
+    """
+    kinds = { 'INITIAL': 'inclusive', **dict(getattr(module, 'states', ())) }
+    functions = { state: [] for state in kinds }
+    strings = { state: [] for state in kinds }
+    errorf, eoff, ignore = {}, {}, {}
+
+    for attr in dir(module):
+        if not attr.startswith('t_'):
+            continue
+        parts = attr.split('_')
+        for i, part in enumerate(parts[1:], 1):
+            if part not in kinds and part != 'ANY':
+                break
+        states = tuple(parts[1:i]) if i > 1 else ('INITIAL',)
+        if 'ANY' in states:
+            states = tuple(kinds)
+        name = '_'.join(parts[i:])
+        value = getattr(module, attr)
+
+        for state in states:
+            if name == 'ignore':
+                ignore[state] = value
+            elif name == 'error':
+                errorf[state] = attr
+            elif name == 'eof':
+                eoff[state] = attr
+            elif callable(value):
+                functions[state].append((value.__code__.co_firstlineno, attr, name, value.__doc__))
+            else:
+                strings[state].append((attr, name, value))
+
+    rules = {}
+    for state in kinds:
+        functions[state].sort()
+        strings[state].sort(key=lambda x: len(x[2]), reverse=True)
+        rules[state] = [(attr, name, regex) for _, attr, name, regex in functions[state]]
+        rules[state] += [(None, name, regex) for _, name, regex in strings[state]]
+
+    for state, kind in kinds.items():
+        if kind == 'inclusive' and state != 'INITIAL':
+            rules[state] += rules['INITIAL']
+            errorf.setdefault(state, errorf.get('INITIAL'))
+            ignore.setdefault(state, ignore.get('INITIAL', ''))
+
+    return {
+        state: {
+            'rules': [(attr, name) for attr, name, _ in rules[state]],
+            'regexes': [regex for _, _, regex in rules[state]],
+            'error': errorf.get(state),
+            'eof': eoff.get(state),
+            'ignore': ignore.get(state, ''),
+        }
+        for state in kinds
+    }
+
+def fingerprint(spec):
+    sha = hashlib.sha256()
+    sha.update(f'{TABLES_VERSION}:'.encode())
+    for state in sorted(spec):
+        sha.update(repr((state, spec[state]['regexes'])).encode())
+    return sha.hexdigest()
+
+def build_classes(sets):
+    """
+    Split the characters in classes that no charset in `sets` distinguishes.
+
+    Returns a dict from the explicitly handled characters (ASCII and any
+    other mentioned by a charset) to their class, the classes of the
+    remaining decimal and non decimal characters, and the classes matched
+    by each charset.
+    """
+    explicit = { chr(c) for c in range(128) }
+    for s in sets:
+        explicit |= s.chars
+    decimal = next(chr(c) for c in itertools.count(128) if chr(c) not in explicit and chr(c).isdecimal())
+    other = next(chr(c) for c in itertools.count(128) if chr(c) not in explicit and not chr(c).isdecimal())
+
+    signatures = {}
+    def classify(c):
+        signature = tuple(c in s for s in sets)
+        return signatures.setdefault(signature, len(signatures))
+
+    classmap = { ord(c): classify(c) for c in sorted(explicit) }
+    decimal, other = classify(decimal), classify(other)
+    matched = { s: [i for signature, i in signatures.items() if signature[k]] for k, s in enumerate(sets) }
+    return classmap, decimal, other, matched
+
+def build_nfa(trees, matched):
+    """Thompson construction of the union of `trees`, finals tagged with the rule index."""
+    counter = itertools.count()
+
+    def new():
+        return State(next(counter))
+
+    def build(node):
+        kind = node[0]
+        start, end = new(), new()
+        if kind == 'set':
+            for symbol in matched[node[1]]:
+                start.add_transition(symbol, end)
+        elif kind == 'cat':
+            last = start
+            for child in node[1]:
+                first, tail = build(child)
+                last.add_epsilon_transition(first)
+                last = tail
+            last.add_epsilon_transition(end)
+        elif kind == 'alt':
+            for child in node[1]:
+                first, tail = build(child)
+                start.add_epsilon_transition(first)
+                tail.add_epsilon_transition(end)
+        else:
+            first, tail = build(node[1])
+            start.add_epsilon_transition(first)
+            tail.add_epsilon_transition(end)
+            if kind in '*+':
+                tail.add_epsilon_transition(first)
+            if kind in '*?':
+                start.add_epsilon_transition(end)
+        return start, end
+
+    automaton = new()
+    for index, tree in enumerate(trees):
+        first, tail = build(tree)
+        tail.final = True
+        tail.tag = index
+        automaton.add_epsilon_transition(first)
+    return automaton
+
+def build_table(automaton, classes):
+    """
+    Minimised transition table of the DFA of `automaton`.
+
+    Returns `rows`, where `rows[s][c]` is the state reached from `s` by a
+    character of class `c` (`-1` if none) and the start state is `0`, and
+    `accept`, the bitmask of the rules matched on each state.
+    """
+    start = automaton.to_deterministic()
+    states = [start]
+    index = { start: 0 }
+    for state in states:
+        for symbol in sorted(state.transitions):
+            target = state.get(symbol)
+            if target not in index:
+                index[target] = len(states)
+                states.append(target)
+
+    rows = [[index[s.get(c)] if s.has_transition(c) else -1 for c in range(classes)] for s in states]
+    accept = [sum(1 << nfa.tag for nfa in s.state if nfa.final) for s in states]
+
+    # Moore's partition refinement, starting from the states matching the same rules
+    blocks = accept
+    count = len(set(blocks))
+    while True:
+        ids = {}
+        refined = [ids.setdefault((blocks[s], tuple(blocks[t] if t >= 0 else -1 for t in row)), len(ids)) for s, row in enumerate(rows)]
+        blocks = refined
+        if len(ids) == count:
+            break
+        count = len(ids)
+
+    # Renumber the blocks in breadth first order from the start state
+    order = { blocks[0]: 0 }
+    representative = [0]
+    for state in representative:
+        for target in rows[state]:
+            if target >= 0 and blocks[target] not in order:
+                order[blocks[target]] = len(representative)
+                representative.append(target)
+
+    minimal = [[order[blocks[t]] if t >= 0 else -1 for t in rows[s]] for s in representative]
+    return minimal, [accept[s] for s in representative]
+
+def compile_tables(spec):
+    trees = { state: [RegexParser(regex).parse() for regex in info['regexes']] for state, info in spec.items() }
+    sets = list(dict.fromkeys(s for state in trees.values() for tree in state for s in charsets(tree)))
+    classmap, decimal, other, matched = build_classes(sets)
+    classes = 1 + max(*classmap.values(), decimal, other)
+    assert classes < 256, 'Character classes must fit on a byte'
+
+    tables = { 'classmap': classmap, 'decimal': decimal, 'other': other, 'states': {} }
+    for state, info in spec.items():
+        rows, accept = build_table(build_nfa(trees[state], matched), classes)
+        tables['states'][state] = { 'rows': rows, 'accept': accept }
+    return tables
+
+_compiled = {}
+
+def load_tables(module, cache=None):
+    """
+    Compiled tables of the token rules of `module`.
+
+    They are built once per process, and also saved on `cache` (if given)
+    to be reused while the rules don't change.
+    """
+    spec = collect_rules(module)
+    key = fingerprint(spec)
+    try:
+        return spec, _compiled[key]
+    except KeyError:
+        pass
+
+    tables = read_cache(cache, key) if cache else None
+    if tables is None:
+        tables = compile_tables(spec)
+        if cache:
+            write_cache(cache, key, tables)
+    for table in tables['states'].values():
+        table['loops'] = [loop_matcher(state, row) for state, row in enumerate(table['rows'])]
+    _compiled[key] = tables
+    return spec, tables
+
+def loop_matcher(state, row):
+    # Matcher skipping the run of classes that loop on `state`, so
+    # long identifiers, strings and comments don't step char by char
+    classes = bytes(c for c, target in enumerate(row) if target == state)
+    if not classes:
+        return None
+    return re.compile(b'[' + re.escape(classes) + b']*').match
+
+class ClassMap(dict):
+    # Characters outside the tables only differ on being decimal digits
+    def __init__(self, tables):
+        super().__init__((c, chr(x)) for c, x in tables['classmap'].items())
+        self.decimal = chr(tables['decimal'])
+        self.other = chr(tables['other'])
+
+    def __missing__(self, c):
+        value = self[c] = self.decimal if chr(c).isdecimal() else self.other
+        return value
+
+class DFALexer:
+    """
+    Drop-in replacement of the lexer built by `ply.lex.lex(module=...)`.
+
+    The regexes of the token rules are compiled to one minimised DFA per
+    lexer state. The input is translated once into a byte string of
+    character classes, which is then scanned with a table loop (skipping
+    at once the runs of classes a state loops on). Rules are
+    resolved like ply does (the first rule in order that matches, with
+    its longest match) and their functions are called with the same
+    tokens and lexer interface.
+    """
+
+    def __init__(self, module, cache=None):
+        spec, tables = load_tables(module, cache)
+        self.classmap = ClassMap(tables)
+        self.states = {}
+        for state, info in spec.items():
+            functions = [(getattr(module, attr) if attr else None, name) for attr, name in info['rules']]
+            table = tables['states'][state]
+            self.states[state] = (
+                table['rows'],
+                table['accept'],
+                table['loops'],
+                functions,
+                info['ignore'],
+                getattr(module, info['error']) if info['error'] else None,
+                getattr(module, info['eof']) if info['eof'] else None,
+            )
+        self.lexdata = None
+        self.lexcodes = None
+        self.lexpos = 0
+        self.lexlen = 0
+        self.lineno = 1
+        self.begin('INITIAL')
+
+    def begin(self, state):
+        self.lexstate = state
+        self.lexrows, self.lexaccept, self.lexloops, self.lexfuncs, self.lexignore, self.lexerrorf, self.lexeoff = self.states[state]
+
+    def current_state(self):
+        return self.lexstate
+
+    def input(self, data):
+        self.lexdata = data
+        self.lexcodes = data.translate(self.classmap).encode('latin-1')
+        self.lexpos = 0
+        self.lexlen = len(data)
+
+    def skip(self, n):
+        self.lexpos += n
+
+    def token(self):
+        lexpos = self.lexpos
+        lexlen = self.lexlen
+        lexdata = self.lexdata
+        codes = self.lexcodes
+
+        while lexpos < lexlen:
+            if lexdata[lexpos] in self.lexignore:
+                lexpos += 1
+                continue
+
+            # Run the DFA as far as it goes, keeping the first rule
+            # (lowest bit) seen on the way and its longest match
+            rows, accept, loops = self.lexrows, self.lexaccept, self.lexloops
+            state, i = 0, lexpos
+            rule, end = 0, lexpos
+            while i < lexlen:
+                state = rows[state][codes[i]]
+                if state < 0:
+                    break
+                i += 1
+                loop = loops[state]
+                if loop:
+                    i = loop(codes, i).end()
+                mask = accept[state]
+                if mask:
+                    low = mask & -mask
+                    if not rule or low < rule:
+                        rule, end = low, i
+                    elif mask & rule:
+                        end = i
+
+            if rule:
+                func, name = self.lexfuncs[rule.bit_length() - 1]
+                tok = LexToken()
+                tok.value = lexdata[lexpos:end]
+                tok.lineno = self.lineno
+                tok.lexpos = lexpos
+                tok.type = name
+
+                if not func:
+                    if tok.type.startswith('ignore_'):
+                        lexpos = end
+                        continue
+                    self.lexpos = end
+                    return tok
+
+                tok.lexer = self
+                self.lexpos = end
+                newtok = func(tok)
+                if not newtok:
+                    lexpos = self.lexpos
+                    continue
+                return newtok
+
+            if self.lexerrorf:
+                # ply passes the whole remaining input, error rules only look at its head
+                tok = LexToken()
+                tok.value = lexdata[lexpos:lexpos + 1]
+                tok.lineno = self.lineno
+                tok.type = 'error'
+                tok.lexer = self
+                tok.lexpos = lexpos
+                self.lexpos = lexpos
+                newtok = self.lexerrorf(tok)
+                if lexpos == self.lexpos:
+                    raise LexError(f"Scanning error. Illegal character '{lexdata[lexpos]}'")
+                lexpos = self.lexpos
+                if not newtok:
+                    continue
+                return newtok
+
+            self.lexpos = lexpos
+            raise LexError(f"Illegal character '{lexdata[lexpos]}' at index {lexpos}")
+
+        if self.lexeoff:
+            tok = LexToken()
+            tok.type = 'eof'
+            tok.value = ''
+            tok.lineno = self.lineno
+            tok.lexpos = lexpos
+            tok.lexer = self
+            self.lexpos = lexpos
+            return self.lexeoff(tok)
+
+        self.lexpos = lexpos + 1
+        if self.lexdata is None:
+            raise RuntimeError('No input string given with input()')
+        return None
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        t = self.token()
+        if t is None:
+            raise StopIteration
+        return t
@@ -1,8 +1,22 @@
 import ply.lex as lex
+import os
 import re
+import mmap
+import locale
 
 from ..cmp import Token
 from ..cmp.cool import grammar as G
+from .dfa import DFALexer
+
+# Scanning backends, selected through COOL_LEXER_BACKEND: `ply` builds the lexer
+# with ply.lex, `dfa` runs the same rules over compiled DFA tables
+BACKENDS = ('ply', 'dfa')
+BACKEND = os.environ.get('COOL_LEXER_BACKEND', 'ply')
+
+# The DFA tables are cached on disk and only rebuilt when the rules change.
+# Set COOL_LEXER_CACHE to an empty string to always compile them from scratch.
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache')
+CACHE_FILE = os.environ.get('COOL_LEXER_CACHE', os.path.join(CACHE_DIR, 'cool_dfa.tables')) or None
 
 class CoolLexer:
 
@@ -109,14 +123,20 @@ class CoolLexer:
     t_ignore = ' \t\f\r\t\v'
     t_comments_ignore = ''
 
-    def __init__(self):
+    def __init__(self, backend=None):
+        self.backend = backend or BACKEND
+        assert self.backend in BACKENDS, f'Unknown lexer backend {self.backend}'
         self.build()
         
     def build(self, **kwargs):
-        self.lexer = lex.lex(module=self, errorlog=lex.NullLogger(), **kwargs)
+        if self.backend == 'dfa':
+            self.lexer = DFALexer(self, cache=CACHE_FILE)
+        else:
+            self.lexer = lex.lex(module=self, errorlog=lex.NullLogger(), **kwargs)
         self.lexer.eof= (1,1)
         self.comment_level = 0
         self.string = ""
+        self.line_start = 0
     
     def t_comments_COMMENTOUT(self, t):
         r'\*\)'
@@ -146,6 +166,7 @@ class CoolLexer:
     def t_strings_newline2(self, t):
         r'\\\n'
         t.lexer.lineno+=1
+        self.line_start = t.lexpos + 2
         self.string += '\n'
 
     def t_strings_invalid_new_line(self, t):
@@ -157,6 +178,7 @@ class CoolLexer:
         t.type = "ERROR"
         t.value = f"({line},{column}) - LexicographicError: Unterminated string constant"
         self.add_line_column(t)
+        self.line_start = t.lexpos + 1
         return t
 
     def t_strings_escaped_special_character(self, t):
@@ -175,6 +197,12 @@ class CoolLexer:
         self.add_line_column(t)
         return t
 
+    def t_strings_text(self, t):
+        r'[^"\\\n\0]+'
+        # Runs of ordinary characters are consumed at once, escapes,
+        # NULs, newlines and the closing quote have their own rules
+        self.string += t.value
+
     def t_strings_character(self, t):
         r'.'
         self.string += t.value
@@ -219,6 +247,7 @@ class CoolLexer:
     def t_ANY_newline(self, t):
         r'\n+'
         t.lexer.lineno += len(t.value)
+        self.line_start = t.lexpos + len(t.value)
 
     def t_LINECOMMENT(self, t):
         r'--.*'
@@ -230,6 +259,12 @@ class CoolLexer:
     def t_comments_COMMENTIN(self, t):
         r'\(\*'
         self.comment_level += 1
+
+    def t_comments_text(self, t):
+        r'(?:[^(*\n]|\*+[^()*\n]|\**\(+[^(*\n])+'
+        # Skip everything but newlines and nesting delimiters at once. Runs of
+        # `(` and `*` are only taken when they can't start a delimiter, so the
+        # match never ends on one of them (a lone one falls to t_comments_error)
             
     def t_eof(self, t):
         t.lexer.eof =(t.lexer.lineno, self.compute_column(t))
@@ -245,8 +280,9 @@ class CoolLexer:
         return t
 
     def compute_column(self, token):
-        line_start = self.text.rfind('\n', 0, token.lexpos) + 1
-        return (token.lexpos - line_start) + 1
+        # Every rule consuming a newline updates `line_start`, so it always
+        # holds the position where the line of the current token begins
+        return (token.lexpos - self.line_start) + 1
 
     def t_LARROW(self, t):
         r'<-'
@@ -357,22 +393,61 @@ class CoolLexer:
         t.lexer.skip(1)
     
     def tokenize(self, text):
+        return list(self.iter_tokens(text))
+
+    def iter_tokens(self, text):
+        """
+        Lazily yield the tokens of `text`, followed by the EOF token.
+
+        Tokens are produced on demand, so the consumer (e.g. the parser)
+        can start working before the whole text is scanned.
+        """
         self.text = text
+        # ply keeps the line and state of the previous input, start afresh
+        # so the same lexer can be reused for many files
+        self.line_start = 0
+        self.comment_level = 0
+        self.string = ""
+        self.lexer.lineno = 1
+        self.lexer.begin('INITIAL')
         self.lexer.input(text)
-        tokens = []
-        original_tokens = [token for token in self.lexer]
-        for token in original_tokens:
+        for token in self.lexer:
             if token.type == "ERROR":
-                tokens.append(Token(token.value, "ERROR"))
+                current = Token(token.value, "ERROR")
             else:
-                tokens.append(Token(token.value, self.tokenType[token.type]))
-            tokens[-1].row = token.row
-            tokens[-1].column = token.column
+                current = Token(token.value, self.tokenType[token.type])
+            current.row = token.row
+            current.column = token.column
+            yield current
         EOF = Token('$', G.eof)
         EOF.row, EOF.column = self.lexer.eof
-        return tokens + [EOF]
+        yield EOF
 
     def add_line_column(self, t):
         t.row = t.lexer.lineno
         t.column = self.compute_column(t)
-        
\ No newline at end of file
+        
+
+def read_source(path, use_mmap=False):
+    """
+    Read the source code at `path` as a text file would do.
+
+    With `use_mmap` the text is decoded straight from a memory map of
+    the file, avoiding the intermediate buffers of a regular read.
+    """
+    if not use_mmap:
+        with open(path, 'r') as fd:
+            return fd.read()
+
+    with open(path, 'rb') as fd:
+        try:
+            source = mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty files can't be mapped
+            return ''
+        with source:
+            text = str(source, locale.getpreferredencoding(False))
+    # Universal newlines, like text mode does
+    if '\r' in text:
+        text = text.replace('\r\n', '\n').replace('\r', '\n')
+    return text
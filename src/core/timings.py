@@ -0,0 +1,173 @@
+"""
+Phase timings and counters of the compiler.
+
+Compilations are measured only while someone listens: register a hook
+with `add_hook` and every compilation (see main.compile_file) calls it
+with a record of its phases, like
+
+    {
+        'file': 'code.cl',
+        'phases': { 'parse': { 'parent': None, 'calls': 1, 'time': 0.012, 'peak': 524288 }, ... },
+        'counters': { 'inference iterations': 3, 'units reused': 4, ... },
+    }
+
+with times in seconds and the peak of the memory traced by tracemalloc
+during the phase in bytes (None unless a hook asked for memory, tracing
+it makes the compilation a few times slower). Phases
+may nest (the lexer runs inside the parser, the register allocator
+inside the MIPS generation), the time of a phase includes the one of
+its children. `merge` and `report` aggregate and print records.
+
+Code being measured marks its phases with `phase` and bumps counters
+with `count`, both do nothing when no compilation is being recorded.
+"""
+import json
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+_hooks = []
+_current = None
+
+def add_hook(hook, memory=True):
+    """Call `hook(record)` after every compilation, tracing the memory of each phase if `memory`"""
+    _hooks.append((hook, memory))
+
+def remove_hook(hook):
+    _hooks[:] = [(h, memory) for h, memory in _hooks if h is not hook]
+
+def enabled():
+    return bool(_hooks)
+
+def tracing_memory():
+    return any(memory for _, memory in _hooks)
+
+def emit(record):
+    """Pass `record` to the hooks (records of other processes get here this way)"""
+    for hook, _ in list(_hooks):
+        hook(record)
+
+class Recorder:
+    def __init__(self, memory):
+        self.memory = memory
+        self.phases = {}
+        self.counters = {}
+        self.stack = []
+
+    @contextmanager
+    def phase(self, name):
+        data = self.phases.get(name)
+        if data is None:
+            data = self.phases[name] = {
+                'parent': self.stack[-1] if self.stack else None,
+                'calls': 0, 'time': 0.0, 'peak': 0 if self.memory else None,
+            }
+        if self.memory:
+            # Peaks are kept per phase, give the enclosing one what it reached so far
+            self.close_peak()
+        self.stack.append(name)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            data['time'] += time.perf_counter() - start
+            data['calls'] += 1
+            if self.memory:
+                self.close_peak()
+            self.stack.pop()
+            if self.memory and self.stack:
+                parent = self.phases[self.stack[-1]]
+                parent['peak'] = max(parent['peak'], data['peak'])
+
+    def close_peak(self):
+        if self.stack:
+            data = self.phases[self.stack[-1]]
+            data['peak'] = max(data['peak'], tracemalloc.get_traced_memory()[1])
+        tracemalloc.reset_peak()
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def timed(self, name, iterable):
+        iterator = iter(iterable)
+        while True:
+            with self.phase(name):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+@contextmanager
+def recording(label):
+    """Record the compilation of `label` if there are hooks, and pass them the record"""
+    global _current
+    if not _hooks or _current is not None:
+        yield
+        return
+
+    memory = tracing_memory()
+    tracing = memory and not tracemalloc.is_tracing()
+    if tracing:
+        tracemalloc.start()
+    _current = Recorder(memory)
+    try:
+        yield
+    finally:
+        recorder, _current = _current, None
+        if tracing:
+            tracemalloc.stop()
+        emit({ 'file': label, 'phases': recorder.phases, 'counters': recorder.counters })
+
+def phase(name):
+    """Context of the phase `name` of the compilation being recorded"""
+    return nullcontext() if _current is None else _current.phase(name)
+
+def count(name, n=1):
+    if _current is not None:
+        _current.count(name, n)
+
+def timed(name, iterable):
+    """Iterate over `iterable` timing each step as the phase `name`"""
+    return iter(iterable) if _current is None else _current.timed(name, iterable)
+
+def merge(records):
+    """Add up the records of many compilations (peaks are the maximum)"""
+    phases, counters = {}, {}
+    for record in records:
+        for name, data in record['phases'].items():
+            total = phases.setdefault(name, { 'parent': data['parent'], 'calls': 0, 'time': 0.0, 'peak': data['peak'] })
+            total['calls'] += data['calls']
+            total['time'] += data['time']
+            if data['peak'] is not None:
+                total['peak'] = max(total['peak'] or 0, data['peak'])
+        for name, n in record['counters'].items():
+            counters[name] = counters.get(name, 0) + n
+    return { 'files': len(records), 'phases': phases, 'counters': counters }
+
+def report(summary, style='text'):
+    """Format a `merge` summary as a table or as JSON"""
+    if style == 'json':
+        return json.dumps(summary, indent=2)
+
+    phases = summary['phases']
+    def depth(name):
+        parent = phases[name]['parent']
+        return 0 if parent is None else 1 + depth(parent)
+
+    # Children go right after their parents
+    def ordered(parent):
+        for name, data in phases.items():
+            if data['parent'] == parent:
+                yield name
+                yield from ordered(name)
+
+    lines = [f'{"phase":<20}{"calls":>8}{"time (ms)":>12}{"peak (KiB)":>12}']
+    for name in ordered(None):
+        data = phases[name]
+        peak = '-' if data['peak'] is None else f'{data["peak"] / 1024:.1f}'
+        lines.append(f'{"  " * depth(name) + name:<20}{data["calls"]:>8}{data["time"] * 1000:>12.2f}{peak:>12}')
+    for name, n in summary['counters'].items():
+        lines.append(f'{name}: {n}')
+    lines.append(f'files: {summary["files"]}')
+    return '\n'.join(lines)
@@ -13,6 +13,7 @@ class TypeNode(Node):
         self.name = name
         self.attributes = []
         self.methods = []
+        self.functions = []
 
 class DataNode(Node):
     def __init__(self, vname, value):
@@ -294,10 +294,21 @@ class BaseCOOLToCILVisitor:
 class COOLToCILVisitor(BaseCOOLToCILVisitor):
     def __init__(self, context):
        super().__init__(context)
+       # Type name -> the names of the types conforming to it, in the order of the context, and their set
+       self.subtypes = {}
+
+    def subtypes_of(self, t:str):
+        try:
+            return self.subtypes[t]
+        except KeyError:
+            typex = self.context.get_type(t)
+            names = [x.name for x in self.context.types.values() if x.conforms_to(typex)]
+            closure = self.subtypes[t] = (names, frozenset(names))
+            return closure
 
     def buildHierarchy(self, t:str):
         if t == 'Object': return None
-        return {x.name for x in self.context.types.values() if x.name != 'AUTO_TYPE' and x.conforms_to(self.context.get_type(t))}
+        return {name for name in self.subtypes_of(t)[0] if name != 'AUTO_TYPE'}
             
     @visitor.on('node')
     def visit(self, node):
@@ -340,6 +351,7 @@ class COOLToCILVisitor(BaseCOOLToCILVisitor):
         type_node = self.register_type(node.id)
         type_node.attributes = [attr.name for attr, _ in self.current_type.all_attributes()]
         type_node.methods = [(method.name, self.to_function_name(method.name, xtype.name)) for method, xtype in self.current_type.all_methods()]
+        first_function = len(self.dotcode)
 
         func_declarations = (f for f in node.features if isinstance(f, cool.FuncDeclarationNode))
         for feature, child_scope in zip(func_declarations, scope.children):
@@ -370,6 +382,8 @@ class COOLToCILVisitor(BaseCOOLToCILVisitor):
 
         self.register_instruction(cil.ReturnNode(instance))
         self.current_function = None
+        # Functions generated for the class, the unit the code generator caches
+        type_node.functions = [f.name for f in self.dotcode[first_function:]]
                 
         self.current_type = None
 
@@ -534,11 +548,8 @@ class COOLToCILVisitor(BaseCOOLToCILVisitor):
         # sorting the branches
         order = []
         for b in node.branches:
-            count = 0
-            t1 = self.context.get_type(b.type)
-            for other in node.branches:
-                t2 = self.context.get_type(other.type)
-                count += t2.conforms_to(t1)
+            _, subtypes = self.subtypes_of(b.type)
+            count = sum(other.type in subtypes for other in node.branches)
             order.append((count, b))
         order.sort(key=lambda x: x[0])
 
@@ -551,7 +562,8 @@ class COOLToCILVisitor(BaseCOOLToCILVisitor):
             h.add(b.type)
             for s in old:
                 h -= s
-            for t in h:
+            # Sorted, a set of names iterates in a different order on every run
+            for t in sorted(h):
                 vbranch_type_name = self.register_local(VariableInfo('branch_type_name', None))
                 self.register_instruction(cil.NameNode(vbranch_type_name, t))
                 self.register_instruction(cil.EqualNode(vcond, vtype, vbranch_type_name))
@@ -1,2 +1,4 @@
 from .ast_printer import PrintVisitor
 from .cil_to_mips import CILToMIPSVisitor
+from .units import CodeUnits
+from .runtime import RuntimeLibrary
@@ -1,4 +1,7 @@
+import io
+
 from .mips import *
+from ... import timings
 from ...visitors import visitor
 
 class PrintVisitor:
@@ -21,16 +24,42 @@ class PrintVisitor:
 
     @visitor.when(ProgramNode)
     def visit(self, node):
-        data_section_header = "\t.data"
-        static_strings = '\n'.join([self.visit(string_const) for string_const in node.data])
-        
-        names_table = f"{TYPENAMES_TABLE_LABEL}:\n" + "\n".join([f"\t.word\t{tp.string_name_label}" for tp in node.types])
-        proto_table = f"{PROTO_TABLE_LABEL}:\n" + "\n".join([f"\t.word\t{tp.label}_proto" for tp in node.types])
+        out = io.StringIO()
+        self.write(node, out)
+        return out.getvalue()
 
-        types = "\n\n".join([self.visit(tp) for tp in node.types])
-        
-        code = "\n".join([self.visit(func) for func in node.functions])
-        return f'{data_section_header}\n{static_strings}\n\n{names_table}\n\n{proto_table}\n\n{types}\n\t.text\n\t.globl main\n{code}' 
+    def write(self, node, out):
+        """
+        Write the code of the program `node` to the text stream `out` a
+        piece at a time. Its functions may be any iterable, each one is
+        printed and written before the next is taken.
+        """
+        out.write("\t.data\n")
+        self.write_joined(out, "\n", self.printed(node.data))
+
+        out.write(f"\n\n{TYPENAMES_TABLE_LABEL}:\n")
+        self.write_joined(out, "\n", (f"\t.word\t{tp.string_name_label}" for tp in node.types))
+        out.write(f"\n\n{PROTO_TABLE_LABEL}:\n")
+        self.write_joined(out, "\n", (f"\t.word\t{tp.label}_proto" for tp in node.types))
+
+        out.write("\n\n")
+        self.write_joined(out, "\n\n", self.printed(node.types))
+
+        out.write("\n\t.text\n\t.globl main\n")
+        self.write_joined(out, "\n", self.printed(node.functions))
+
+    def printed(self, nodes):
+        # The nodes may be generated as they're taken, only their printing is timed here
+        for node in nodes:
+            with timings.phase('print'):
+                code = self.visit(node)
+            yield code
+
+    def write_joined(self, out, separator, pieces):
+        for i, piece in enumerate(pieces):
+            if i:
+                out.write(separator)
+            out.write(piece)
     
     @visitor.when(StringConst)
     def visit(self, node):
@@ -67,6 +96,10 @@ class PrintVisitor:
         instructions = "\n\t".join(instr2)
         return f'{node.label}:\n\t{instructions}'
     
+    @visitor.when(AssembledFunctionNode)
+    def visit(self, node):
+        return node.code
+
     @visitor.when(AddInmediateNode)
     def visit(self, node):
         return f'addi {self.visit(node.dest)}, {self.visit(node.src)}, {self.visit(node.value)}'
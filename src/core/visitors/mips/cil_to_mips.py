@@ -1,9 +1,11 @@
+import re
 import itertools as itt
 
+from ... import timings
 from ...visitors import visitor
 from ..cil import cil
 from ..mips import mips
-from random import choice
+from .runtime import ROUTINES
 from collections import defaultdict
 
 
@@ -19,8 +21,8 @@ class MemoryManager:
         return self.registers[index]  
     
     def get_reg_unusued(self, used = []):
-        possibles = list(set(self.registers).difference(set(used)))
-        return choice(possibles)
+        # The first one free, the same program must always get the same code
+        return next(reg for reg in self.registers if reg not in used)
 
 
 class LabelGenerator:
@@ -42,9 +44,36 @@ class LabelGenerator:
         return f'L_{self.code_count}'
 
 
+def data_references(function):
+    """Data nodes used by a CIL function, in order of first use"""
+    refs = []
+    for instruction in function.instructions:
+        if isinstance(instruction, cil.LoadNode):
+            data = instruction.msg
+        elif isinstance(instruction, cil.ErrorNode):
+            data = instruction.data_node
+        else:
+            continue
+        if not any(data is ref for ref in refs):
+            refs.append(data)
+    return refs
+
+
 class CILToMIPSVisitor:
-    def __init__(self, label_generator = LabelGenerator()):
-        self._label_generator = label_generator
+    CODE_LABEL = re.compile(r'\b(?:L|data)_\d+\b')
+
+    def __init__(self, label_generator = None, assembled = None):
+        # Labels are numbered per program, a generator shared among
+        # visitors would shift them (and break `type_4_proto` below)
+        self._label_generator = label_generator if label_generator is not None else LabelGenerator()
+        # Relocatable code of functions generated by earlier compilations,
+        # by CIL name (see `relocatable`), linked instead of translated
+        self._assembled = assembled if assembled is not None else {}
+        self._function_labels = {}
+        # Routines of the runtime library the code calls, the program
+        # gets those (and the ones they use) linked after it
+        self.runtime_calls = set()
+        self._function_calls = {}
         self.memory_manager = None
         self._types = {}
         self._data_section = {}
@@ -96,6 +125,47 @@ class CILToMIPSVisitor:
     
     def get_mips_label(self, label):
         return self._labels_map[label]
+
+    def relocatable(self, node, code):
+        """
+        Turn `code`, the printed translation of the CIL function `node`,
+        into a template whose labels are `{i}` placeholders, along with the
+        symbol each placeholder stands for and the runtime routines called.
+        Labels are numbered through the whole program, so `link_function`
+        resolves the symbols again in the program the code is reused in.
+        """
+        symbols = { label: ('function', name) for name, label in self._name_func_map.items() }
+        symbols.update((label, ('label', name)) for name, label in self._function_labels[node.name].items())
+        for i, data in enumerate(data_references(node)):
+            symbols[self._data_section[data.name].label] = ('data', i)
+
+        used = {}
+        def placeholder(match):
+            symbol = symbols[match.group()]
+            if symbol not in used:
+                used[symbol] = len(used)
+            return f'{{{used[symbol]}}}'
+
+        template = self.CODE_LABEL.sub(placeholder, code.replace('{', '{{').replace('}', '}}'))
+        return template, list(used), sorted(self._function_calls[node.name])
+
+    def link_function(self, node, template, symbols, calls):
+        self._labels_map = {}
+        for instruction in node.instructions:
+            self.collect_labels_in_func(instruction)
+        data = data_references(node)
+
+        def resolve(kind, value):
+            if kind == 'function':
+                return self._name_func_map[value]
+            if kind == 'label':
+                return self._labels_map[value]
+            return self._data_section[data[value].name].label
+
+        code = template.format(*(resolve(*symbol) for symbol in symbols))
+        self.register_function(node.name, mips.AssembledFunctionNode(self._name_func_map[node.name], code))
+        self.runtime_calls.update(calls)
+        self._labels_map = {}
     
     @visitor.on('node')
     def collect_func_names(self, node):
@@ -133,6 +203,16 @@ class CILToMIPSVisitor:
     
     @visitor.when(cil.ProgramNode)
     def visit(self, node):
+        program = self.stream(node)
+        return mips.ProgramNode(program.data, program.types, list(program.functions))
+
+    def stream(self, node):
+        """
+        Convert the CIL program `node` to a MIPS ProgramNode whose functions
+        are translated while they are iterated, in order, and forgotten
+        right after. Printing them as they come keeps a single function
+        alive at a time.
+        """
         #Get functions names
         self.collect_func_names(node)
 
@@ -144,10 +224,13 @@ class CILToMIPSVisitor:
         for data in node.dotdata:
             self.visit(data)
         
-        for func in node.dotcode:
-            self.visit(func)
-        
-        return mips.ProgramNode( [data for data in self._data_section.values()], [tp for tp in self._types.values()], [func for func in self._functions.values()])
+        return mips.ProgramNode( [data for data in self._data_section.values()], [tp for tp in self._types.values()], self.translate_functions(node.dotcode))
+
+    def translate_functions(self, functions):
+        for func in functions:
+            with timings.phase('mips'):
+                self.visit(func)
+            yield self._functions.pop(func.name)
 
     @visitor.when(cil.TypeNode)
     def visit(self, node):
@@ -170,6 +253,10 @@ class CILToMIPSVisitor:
 
     @visitor.when(cil.FunctionNode)
     def visit(self, node):
+        if node.name in self._assembled:
+            self.link_function(node, *self._assembled[node.name])
+            return
+
         used_regs_finder = UsedRegisterFinder()
 
         label = self._name_func_map[node.name]
@@ -184,7 +271,8 @@ class CILToMIPSVisitor:
         ra = RegistersAllocator()
 
         if len(node.instructions):
-            reg_for_var = ra.get_registers_for_variables(node.instructions, node.params, len(mips.REGISTERS))
+            with timings.phase('regalloc'):
+                reg_for_var = ra.get_registers_for_variables(node.instructions, node.params, len(mips.REGISTERS))
             self.memory_manager = MemoryManager(mips.REGISTERS, lambda x : reg_for_var[x])
 
         for instruction in node.instructions:
@@ -227,6 +315,10 @@ class CILToMIPSVisitor:
         
         func_instructions = list(itt.chain(initial_instructions, code_instructions, final_instructions))
         new_func.add_instructions(func_instructions)
+        self._function_labels[node.name] = self._labels_map
+        calls = { i.label for i in func_instructions if isinstance(i, mips.JumpAndLinkNode) and i.label in ROUTINES }
+        self._function_calls[node.name] = calls
+        self.runtime_calls.update(calls)
 
         self.finish_functions()    
        
@@ -1008,7 +1100,8 @@ class UsedRegisterFinder:
         for inst in instructions:
             self.visit(inst)
         self.used_registers = set.difference(self.used_registers, set([mips.SP_REG, mips.FP_REG, mips.V0_REG]))
-        return [reg for reg in self.used_registers]
+        # Registers hash by identity, sort them so they are saved in the same order on every run
+        return sorted(self.used_registers, key=lambda reg: reg.name)
 
     @visitor.on('node')
     def visit(self, node):
@@ -1076,7 +1169,6 @@ class RegistersAllocator:
         self.mark = False
         
     def get_registers_for_variables(self, instructions, params, n):
-        self.numbered_instructions(instructions)
         basic_blocks = self.divide_basics_blocks(instructions)
         flow_graph = RegistersAllocator.create_flow_graph(basic_blocks)
         gk, io = self.liveness_analysis((basic_blocks, flow_graph), params)
@@ -1084,14 +1176,15 @@ class RegistersAllocator:
         return RegistersAllocator.assign_registers(interference, n)
 
     def divide_basics_blocks(self, instructions):
+        # Leaders are kept apart, marking the CIL nodes would keep them
+        # around (and grow them) for the rest of the compilation
         self.mark = True
-        for instruction in instructions:
-            self.mark_leaders(instruction)
+        leaders = [self.mark_leaders(instruction) for instruction in instructions]
 
         blocks = []
 
-        for instruction in instructions:
-            if instruction.leader:
+        for instruction, leader in zip(instructions, leaders):
+            if leader:
                 blocks.append([instruction])
             else:
                 blocks[-1].append(instruction)
@@ -1106,14 +1199,20 @@ class RegistersAllocator:
             instructions.extend(block)
         instructions_total = len(instructions)
 
+        # Instructions are numbered by their position in the function
+        starts = [0]
+        for block in blocks[:-1]:
+            starts.append(starts[-1] + len(block))
+
         suc = [ 0 for _ in range(instructions_total) ]
         for block_index, block in enumerate(blocks):
             for ins_index, instruction in enumerate(block):
+                number = starts[block_index] + ins_index
                 if ins_index == len(block) - 1:
                     ady = [ i for i in range(len(blocks)) if ady_list[block_index][i] == 1 ]
-                    suc[instruction.number] = [ blocks[b][0].number for b in ady ]
+                    suc[number] = [ starts[b] for b in ady ]
                 else:
-                    suc[instruction.number] = [ block[ins_index + 1].number ]
+                    suc[number] = [ number + 1 ]
         
         gk = [self.gen_kill(inst) for inst in instructions] 
         io = RegistersAllocator.out_in_compute(suc, gk)
@@ -1148,7 +1247,8 @@ class RegistersAllocator:
     def assign_registers(interference_graph, n):
         stack = []
         var_registers = defaultdict(lambda : -1)
-        nodes = set(interference_graph.keys())
+        # Ordered, so the variables are colored in the same order on every run
+        nodes = dict.fromkeys(interference_graph)
 
         def myLen(l):
             count = 0
@@ -1167,11 +1267,11 @@ class RegistersAllocator:
                     break
             
             if to_remove:
-                nodes.remove(to_remove)
+                del nodes[to_remove]
             else:
-                selection = choice(list(nodes))
+                selection = next(iter(nodes))
                 stack.append((selection, interference_graph[selection]))
-                nodes.remove(selection)
+                del nodes[selection]
         
         while stack:
             node, ady = stack.pop()
@@ -1237,11 +1337,6 @@ class RegistersAllocator:
                 
         return graph            
 
-    @staticmethod
-    def numbered_instructions(instructions):
-        for i, instr in enumerate(instructions):
-            instr.number = i
-
     @visitor.on('instruction')
     def gen_kill(self, instruction):
         pass
@@ -1378,20 +1473,20 @@ class RegistersAllocator:
 
     @visitor.when(cil.LabelNode)
     def mark_leaders(self, instruction):
-        instruction.leader = True
         self.mark = False
+        return True
 
     @visitor.when(cil.GotoNode)
     def mark_leaders(self, instruction):
-        instruction.leader = self.mark
-        self.mark = True
+        leader, self.mark = self.mark, True
+        return leader
 
     @visitor.when(cil.GotoIfNode)
     def mark_leaders(self, instruction):
-        instruction.leader = self.mark
-        self.mark = True
+        leader, self.mark = self.mark, True
+        return leader
     
     @visitor.when(cil.InstructionNode)
     def mark_leaders(self, instruction):
-        instruction.leader = self.mark
-        self.mark = False
+        leader, self.mark = self.mark, False
+        return leader
@@ -82,6 +82,20 @@ class FunctionNode(Node):
         except ValueError:
             return self.get_local_stack_location(name)
         
+class AssembledFunctionNode(Node):
+    """Function whose code is already printed, reused from an earlier compilation"""
+    def __init__(self, label, code):
+        self._label = label
+        self._code = code
+
+    @property
+    def label(self):
+        return self._label
+
+    @property
+    def code(self):
+        return self._code
+
 class DataNode(Node):
     def __init__(self, label):
         self._label  = label
@@ -0,0 +1,105 @@
+"""
+The runtime library (mips_lib.asm), linked routine by routine.
+
+Programs only get the routines they can reach: the ones their code
+calls (see CILToMIPSVisitor.runtime_calls) and, transitively, the ones
+those use. A routine takes from the comments right before its label up
+to the next routine, the labels in between are its own. The definitions
+at the top of the file go into every program.
+"""
+import re
+
+# Routines of the library and the routines each one calls or jumps to
+ROUTINES = {
+    'mem_manager_init': ['extend_heap'],
+    'free_block': ['expand_block'],
+    'expand_block': [],
+    'extend_heap': [],
+    'split_block': [],
+    'malloc': ['extend_heap', 'split_block'],
+    'gc_collect': ['check_if_is_object', 'free_block', 'gc_collect_recursive_expand'],
+    'gc_collect_recursive_expand': ['check_if_is_object'],
+    'copy': [],
+    'check_if_is_object': [],
+    'equals': [],
+    'less_equal': [],
+    'less': [],
+    'len': [],
+    'use_block': [],
+    'read_str': ['expand_block', 'extend_heap', 'split_block', 'use_block'],
+    'concat': ['malloc'],
+    'substr': ['malloc'],
+    'equal_str': [],
+}
+
+LABEL = re.compile(rb'([A-Za-z_]\w*):')
+SYMBOL = re.compile(rb'(?<![\w$])[A-Za-z_]\w*')
+JUMP = re.compile(rb'(j|jr)\b')
+
+def code_of(line):
+    return line.split(b'#', 1)[0].strip()
+
+def instruction_of(line):
+    match = LABEL.match(line)
+    return code_of(line[match.end():] if match else line)
+
+class RuntimeLibrary:
+    def __init__(self, text):
+        self.text = text
+        lines = text.splitlines(keepends=True)
+
+        starts = {}
+        for i, line in enumerate(lines):
+            match = LABEL.match(line)
+            if match and match.group(1).decode() in ROUTINES:
+                # The comments on top of the label go with it, the blank lines don't
+                start = i
+                while start > 0 and not code_of(lines[start - 1]):
+                    start -= 1
+                while start < i and not lines[start].strip():
+                    start += 1
+                starts[match.group(1).decode()] = start
+        missing = set(ROUTINES) - set(starts)
+        if missing:
+            raise ValueError(f'routines missing from the runtime library: {", ".join(sorted(missing))}')
+
+        self.order = sorted(starts, key=starts.get)
+        bounds = [starts[name] for name in self.order] + [len(lines)]
+        self.preamble = b''.join(lines[:bounds[0]])
+        self.routines = { name: lines[bounds[i]:bounds[i + 1]] for i, name in enumerate(self.order) }
+        self.check()
+        self.routines = { name: b''.join(code) for name, code in self.routines.items() }
+
+    def check(self):
+        """Make sure the routines don't run into the next one and use only the routines they declare"""
+        owners = {}
+        for name, code in self.routines.items():
+            for line in code:
+                match = LABEL.match(line)
+                if match:
+                    owners[match.group(1)] = name
+
+        for name, code in self.routines.items():
+            instructions = [instruction for instruction in map(instruction_of, code) if instruction]
+            if not JUMP.match(instructions[-1]):
+                raise ValueError(f'routine {name} of the runtime library falls through the next one')
+            for instruction in instructions:
+                for symbol in SYMBOL.findall(instruction):
+                    owner = owners.get(symbol, name)
+                    if owner != name and owner not in ROUTINES[name]:
+                        raise ValueError(f'routine {name} of the runtime library uses {owner}, which it does not declare')
+
+    def closure(self, roots):
+        """Names of the routines reachable from `roots` (other names are ignored), in the order of the library"""
+        reached = set()
+        pending = [name for name in roots if name in ROUTINES]
+        while pending:
+            name = pending.pop()
+            if name not in reached:
+                reached.add(name)
+                pending.extend(ROUTINES[name])
+        return [name for name in self.order if name in reached]
+
+    def link(self, roots):
+        """The library with only the routines reachable from `roots`"""
+        return self.preamble + b''.join(self.routines[name] for name in self.closure(roots))
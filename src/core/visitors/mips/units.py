@@ -0,0 +1,145 @@
+"""
+Incremental code generation, one class at a time.
+
+The functions CIL generates for a class form a unit. Translating them to
+MIPS depends on their CIL code and on part of the layout of the types
+they use: the index of the types they allocate or name, the attributes
+of the types they access and the methods of the types they dispatch on
+(the class itself and its ancestors among them). The fingerprint of a
+unit covers both, so a unit is translated again only when its own code
+or one of those layouts changed.
+
+The code of each unit is kept in a cache (an ArtifactCache or anything
+with its `key`, `get` and `put`) as relocatable templates, and linked
+into the next programs that produce the same fingerprint.
+"""
+from ... import timings
+from ..cil import cil
+from . import mips
+from .ast_printer import PrintVisitor
+from .cil_to_mips import CILToMIPSVisitor, data_references
+
+# CIL instructions whose translation depends on the layout of a type,
+# the field naming the type and the part of the layout they use
+LAYOUT_FIELDS = {
+    cil.AllocateNode: ('type', 'index'),
+    cil.NameNode: ('name', 'index'),
+    cil.GetAttribNode: ('computed_type', 'attributes'),
+    cil.SetAttribNode: ('computed_type', 'attributes'),
+    cil.DynamicCallNode: ('computed_type', 'methods'),
+}
+
+def type_name(value):
+    return value if isinstance(value, str) else value.name
+
+def describe(value, data):
+    if isinstance(value, cil.DataNode):
+        # Data is renumbered from program to program, only which one is used matters
+        return f'data#{next(i for i, ref in enumerate(data) if ref is value)}'
+    if isinstance(value, cil.VoidNode):
+        return 'void'
+    if value is None or isinstance(value, (str, int)):
+        return repr(value)
+    return f'type {value.name}'
+
+def function_fingerprint(node):
+    data = data_references(node)
+    lines = [
+        f'function {node.name}',
+        'params ' + ' '.join(param.name for param in node.params),
+        'locals ' + ' '.join(local.name for local in node.localvars),
+    ]
+    for instruction in node.instructions:
+        fields = sorted(vars(instruction).items())
+        lines.append(type(instruction).__name__ + ' ' + ' '.join(f'{k}={describe(v, data)}' for k, v in fields))
+    return lines
+
+def used_layouts(functions):
+    """`(part, type name)` of the layouts the translation of `functions` depends on"""
+    used = set()
+    for function in functions:
+        for instruction in function.instructions:
+            layout = LAYOUT_FIELDS.get(type(instruction))
+            if layout is not None:
+                field, part = layout
+                used.add((part, type_name(getattr(instruction, field))))
+    return used
+
+def layouts(program):
+    layouts = {}
+    for index, tp in enumerate(program.dottypes):
+        layouts['index', tp.name] = str(index)
+        layouts['attributes', tp.name] = ' '.join(tp.attributes)
+        layouts['methods', tp.name] = ' '.join(dict.fromkeys(name for name, _ in tp.methods))
+    return layouts
+
+class CodeUnits:
+    def __init__(self, cache):
+        self.cache = cache
+
+    def units(self, program):
+        """`(name, functions)` of each class, and the built-in functions under the name ''"""
+        functions = { f.name: f for f in program.dotcode }
+        owned = set()
+        units = []
+        for tp in program.dottypes:
+            if tp.functions:
+                units.append((tp.name, [functions[name] for name in tp.functions]))
+                owned.update(tp.functions)
+        units.insert(0, ('', [f for f in program.dotcode if f.name not in owned]))
+        return units
+
+    def fingerprint(self, name, functions, layouts):
+        lines = [f'unit {name}']
+        for function in functions:
+            lines.extend(function_fingerprint(function))
+        for part, tp in sorted(used_layouts(functions)):
+            # Unknown names are left to fail in the translation, like without units
+            if (part, tp) in layouts:
+                lines.append(f'{part} of {tp}: {layouts[part, tp]}')
+        return '\n'.join(lines)
+
+    def write(self, program, out):
+        """
+        Translate `program` to MIPS code written to `out`, reusing the units
+        found in the cache. Returns the runtime routines the code calls.
+        """
+        with timings.phase('units'):
+            program_layouts = layouts(program)
+            assembled = {}
+            entries = []
+            fresh = {}
+            for name, functions in self.units(program):
+                key = self.cache.key(self.fingerprint(name, functions, program_layouts), '', { 'unit': 'mips' })
+                entry = self.cache.get(key)
+                if entry is None:
+                    entry = {}
+                    entries.append((key, entry))
+                    fresh.update((function.name, entry) for function in functions)
+                else:
+                    assembled.update(entry)
+                    timings.count('units reused')
+            timings.count('units generated', len(entries))
+
+        cil_to_mips = CILToMIPSVisitor(assembled=assembled)
+        mips_program = cil_to_mips.stream(program)
+        printer = PrintVisitor()
+
+        # Print the new functions once, both for the program and for the cache
+        def functions():
+            for function, mips_function in zip(program.dotcode, mips_program.functions):
+                entry = fresh.get(function.name)
+                if entry is not None:
+                    with timings.phase('print'):
+                        code = printer.visit(mips_function)
+                    entry[function.name] = cil_to_mips.relocatable(function, code)
+                    mips_function = mips.AssembledFunctionNode(mips_function.label, code)
+                yield mips_function
+
+        printer.write(mips.ProgramNode(mips_program.data, mips_program.types, functions()), out)
+
+        with timings.phase('units'):
+            for key, entry in entries:
+                self.cache.put(key, entry)
+
+        return cil_to_mips.runtime_calls
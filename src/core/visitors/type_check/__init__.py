@@ -3,4 +3,5 @@ from .builder import TypeBuilder
 from .verifier import TypeVerifier
 from .collector import TypeCollector
 from .inferencer import InferenceVisitor
+from .analyzer import SemanticAnalyzer
 from .ast_printer import FormatVisitor
@@ -0,0 +1,53 @@
+from ... import timings
+from .builder import TypeBuilder
+from .verifier import TypeVerifier
+from .collector import TypeCollector
+from .inferencer import InferenceVisitor
+
+# Semantic Analyzer
+class SemanticAnalyzer:
+    """
+    Schedules the semantic phases over an AST in two passes. The first
+    declares the types (TypeCollector then TypeBuilder, the builder
+    needs every class name the collector registers) and numbers the
+    class tree they leave for the subtyping tests. The second checks
+    and infers the types until they settle, and verifies the methods
+    of the last checking pass with no other walk of its own.
+    """
+    def __init__(self):
+        self.context = None
+        self.scope = None
+
+    def analyze(self, ast):
+        """The errors of `ast`, in the order the phases report them"""
+        with timings.phase('declare'):
+            with timings.phase('collect'):
+                collector = TypeCollector()
+                collector.visit(ast)
+            self.context = collector.context
+            with timings.phase('build'):
+                builder = TypeBuilder(self.context)
+                builder.visit(ast)
+            self.context.freeze()
+        errors = collector.errors + builder.errors
+
+        with timings.phase('check'):
+            inferencer = InferenceVisitor(self.context)
+            changed = True
+            while changed:
+                timings.count('inference iterations')
+                inferencer.errors.clear()
+                changed, self.scope = inferencer.visit(ast)
+            if not inferencer.settled:
+                # The last pass gave a type to variables with nothing to infer from, check with it
+                inferencer.errors.clear()
+                _, self.scope = inferencer.visit(ast)
+            with timings.phase('verify'):
+                verifier = TypeVerifier(self.context)
+                verifier.verify(inferencer.methods)
+        errors.extend(inferencer.errors)
+
+        for e in verifier.errors:
+            if not e in errors:
+                errors.append(e)
+        return errors
@@ -4,10 +4,10 @@ from ...cmp import cool_ast as cool, SemanticError, empty_token, ErrorType
 
 # Type Builder
 class TypeBuilder:
-    def __init__(self, context, errors=[]):
+    def __init__(self, context, errors=None):
         self.context = context
         self.current_type = None
-        self.errors = errors
+        self.errors = [] if errors is None else errors
         self.methods = {}
     
     @visitor.on('node')
@@ -5,11 +5,13 @@ from ...cmp import IntType, BoolType, StringType, SemanticError, ErrorType, Self
 
 # Type Checker
 class TypeChecker:
-    def __init__(self, context, errors=[]):
+    def __init__(self, context, errors=None):
         self.context = context
         self.current_type = None
         self.current_method = None
-        self.errors = errors
+        self.errors = [] if errors is None else errors
+        # Methods met by the last pass with their types, so TypeVerifier doesn't walk the AST again
+        self.methods = []
 
     @visitor.on('node')
     def visit(self, node, scope):
@@ -18,12 +20,18 @@ class TypeChecker:
     @visitor.when(cool.ProgramNode)
     def visit(self, node, scope=None):
         scope = Scope()
+        self.methods = []
         for declaration in node.declarations:
             self.visit(declaration, scope.create_child())
         return scope
 
     @visitor.when(cool.ClassDeclarationNode)
     def visit(self, node, scope):
+        for feature in self.check_attributes(node, scope):
+            self.visit(feature, scope.create_child())
+
+    def check_attributes(self, node, scope):
+        # Defines the attributes of the class in `scope` and checks them, returns the methods
         self.current_type = self.context.get_type(node.id)
         
         scope.define_variable('self', SelfType(self.current_type))
@@ -53,9 +61,7 @@ class TypeChecker:
                 count += 1
             else:
                 pending.append(feature)
-
-        for feature in pending:  
-            self.visit(feature, scope.create_child())
+        return pending
     
     @visitor.when(cool.AttrDeclarationNode)
     def visit(self, node, scope):
@@ -73,6 +79,7 @@ class TypeChecker:
     @visitor.when(cool.FuncDeclarationNode)
     def visit(self, node, scope):
         self.current_method = node.id
+        self.methods.append((self.current_type, node))
         
         for pname, ptype, pnode in zip(node.arg_names, node.arg_types, node.arg_nodes):
             var = scope.define_variable(pname, ptype)
@@ -31,9 +31,9 @@ def define_built_in_types(context):
 
 # Type Collector
 class TypeCollector:
-    def __init__(self, errors=[]):
+    def __init__(self, errors=None):
         self.context = None
-        self.errors = errors
+        self.errors = [] if errors is None else errors
         self.type_level = {}
         self.parent = {}
     
@@ -1,20 +1,101 @@
 from .utils import *
+from ... import timings
 from ...visitors import visitor
 from .checker import TypeChecker
 from ...cmp import cool_ast as cool
-from ...cmp import SemanticError, AutoType, SelfType, InferenceSets
+from ...cmp import SemanticError, AutoType, SelfType, InferenceSets, Scope
 
 # Type Inference Visitor
+#
+# The first pass checks the whole program, the next ones only check
+# again the units (the attributes of a class, with its scope, or a
+# method) that read a type inferred since. The constraints, errors and
+# methods of the other units are those of their last check, so every
+# pass ends up as a full check of the program would.
 class InferenceVisitor(TypeChecker):
-    def __init__(self, context, errors=[]):
+    def __init__(self, context, errors=None):
         super().__init__(context, errors)
         self.variable = {}
+        # Whether the last pass left every type as it found it, so a new one would repeat it
+        self.settled = False
+
+        self.scope = None
+        self.unit = None
+        self.log = []
+        self.worklist = set()
+        # Unit -> (errors, constraints, methods) of its last check
+        self.results = {}
+        # Class -> its methods, method -> the scope it was checked in
+        self.features = {}
+        self.scopes = {}
+        # Node that may be inferred -> the unit reading its type (its class for attributes)
+        self.owners = {}
+        self.attributes = {}
+        # Method name -> the units calling it, and the parameters and methods with that name
+        self.callers = {}
+        self.signatures = {}
 
     def inference(self, node, ntype, conforms=True):
+        self.log.append((node, ntype, conforms))
+        self.owners.setdefault(node, self.unit)
+
+    def constrain(self, log):
+        for node, ntype, conforms in log:
+            try:
+                self.variable[node].add(ntype, conforms)
+            except KeyError:
+                self.variable[node] = InferenceSets().add(ntype, conforms)
+
+    def prepare(self, node):
+        # The dependencies the types of the program can't change, and a worklist with every unit
+        self.scope = Scope()
+        for declaration in node.declarations:
+            self.scope.create_child()
+            typex = self.context.get_type(declaration.id)
+            methods = self.features[declaration] = []
+            for feature in declaration.features:
+                if isinstance(feature, cool.AttrDeclarationNode):
+                    self.owners[feature] = declaration
+                    self.attributes[feature] = typex
+                    continue
+                methods.append(feature)
+                for signature in [feature] + feature.params:
+                    self.owners[signature] = feature
+                    self.signatures[signature] = feature.id
+        self.worklist.update(node.declarations)
+
+    def invalidate(self, node):
+        # Put back in the worklist the units reading the type just inferred for `node`
+        if node in self.attributes:
+            typex = self.attributes[node]
+            self.worklist.update(d for d in self.features if self.context.get_type(d.id).conforms_to(typex))
+        else:
+            self.worklist.add(self.owners[node])
+        if node in self.signatures:
+            self.worklist.update(self.callers.get(self.signatures[node], ()))
+
+    def check(self, unit, check, *args):
+        timings.count('inference units checked')
+        errors, self.errors = self.errors, []
+        self.unit, self.log, self.methods = unit, [], []
         try:
-            self.variable[node].add(ntype, conforms)
-        except KeyError:
-            self.variable[node] = InferenceSets().add(ntype, conforms)
+            return check(*args)
+        finally:
+            self.results[unit] = (self.errors, self.log, self.methods)
+            self.errors = errors
+
+    def check_class(self, node, index):
+        scope = self.scope.children[index] = Scope(self.scope)
+        for method in self.check(node, self.check_attributes, node, scope):
+            self.scopes[method] = scope.create_child()
+            self.check(method, self.visit, method, self.scopes[method])
+
+    def check_method(self, node, method):
+        self.current_type = self.context.get_type(node.id)
+        old = self.scopes[method]
+        scope = self.scopes[method] = Scope(old.parent)
+        old.parent.children[old.parent.children.index(old)] = scope
+        self.check(method, self.visit, method, scope)
 
     @visitor.on('node')
     def context_update(self, node, ntype):
@@ -97,37 +178,59 @@ class InferenceVisitor(TypeChecker):
 
     @visitor.when(cool.Node)
     def visit(self, node, scope):
-        if not issubclass(node.__class__, cool.BinaryNode):
-            super().visit(node, scope)
+        super().visit(node, scope)
 
     @visitor.when(cool.ProgramNode)
     def visit(self, node, scope=None):
-        scope = super().visit(node, scope) 
-
-        infered = 0
-        pending = []
-        OBJ = self.context.get_type('Object')
-        for (auto, sets) in self.variable.items():
-            try:
-                if (len(sets.D) + len(sets.S) == 1):
-                    pending.append(auto)
+        if self.scope is None:
+            self.prepare(node)
+        with timings.phase('typecheck'):
+            worklist, self.worklist = self.worklist, set()
+            for index, declaration in enumerate(node.declarations):
+                if declaration in worklist:
+                    self.check_class(declaration, index)
                     continue
-                ok, D1 = check_path(sets.D, OBJ)
-                assert ok
-                if len(sets.S) and not isinstance(D1, SelfType):
-                    candidate = LCA(sets.S)
-                    assert LCA([candidate, D1]) == D1
-                    D1 = candidate
-                auto.type = D1.name
-                self.context_update(auto, D1)
-                infered += 1
-            except AssertionError:
-                self.errors.append((SemanticError(f'Bad use of AUTO_TYPE detected'), auto.ttype))
-        if not infered:
-            for auto in pending:
-                auto.type = OBJ.name
-                self.context_update(auto, OBJ)
-        self.variable.clear()
+                for method in self.features[declaration]:
+                    if method in worklist:
+                        self.check_method(declaration, method)
+
+        with timings.phase('solve'):
+            self.methods = []
+            for declaration in node.declarations:
+                for unit in [declaration] + self.features[declaration]:
+                    errors, log, methods = self.results[unit]
+                    self.errors.extend(errors)
+                    self.constrain(log)
+                    self.methods.extend(methods)
+            scope = self.scope
+
+            infered = 0
+            pending = []
+            OBJ = self.context.get_type('Object')
+            for (auto, sets) in self.variable.items():
+                try:
+                    if (len(sets.D) + len(sets.S) == 1):
+                        pending.append(auto)
+                        continue
+                    ok, D1 = check_path(sets.D, OBJ)
+                    assert ok
+                    if len(sets.S) and not isinstance(D1, SelfType):
+                        candidate = LCA(sets.S)
+                        assert LCA([candidate, D1]) == D1
+                        D1 = candidate
+                    auto.type = D1.name
+                    self.context_update(auto, D1)
+                    self.invalidate(auto)
+                    infered += 1
+                except AssertionError:
+                    self.errors.append((SemanticError(f'Bad use of AUTO_TYPE detected'), auto.ttype))
+            if not infered:
+                for auto in pending:
+                    auto.type = OBJ.name
+                    self.context_update(auto, OBJ)
+                    self.invalidate(auto)
+            self.variable.clear()
+        self.settled = not infered and not pending
         return infered, scope
     
     @visitor.when(cool.AttrDeclarationNode)
@@ -211,6 +314,7 @@ class InferenceVisitor(TypeChecker):
     
     @visitor.when(cool.FunctionCallNode)
     def visit(self, node, scope):
+        self.callers.setdefault(node.id, set()).add(self.unit)
         super().visit(node, scope)
 
         args, real = node.info
@@ -225,6 +329,7 @@ class InferenceVisitor(TypeChecker):
 
     @visitor.when(cool.MemberCallNode)
     def visit(self, node, scope):
+        self.callers.setdefault(node.id, set()).add(self.unit)
         super().visit(node, scope)
 
         args, real = node.info
@@ -25,7 +25,9 @@ def update_condition(target, value):
     return c1 and c2
 
 # Compute the Lowest Common Ancestor in
-# the type hierarchy tree
+# the type hierarchy tree, by binary lifting
+# over the numbers of Context.freeze if they
+# are up to date
 def LCA(type_list):
     counter = {}
 
@@ -39,6 +41,13 @@ def LCA(type_list):
     if any(check(ErrorType)):
         return ErrorType()
     type_list = [fixed_type(t) for t in type_list]
+    if all(t is not None and t.numbered() for t in type_list):
+        lca = type_list[0]
+        for typex in type_list[1:]:
+            if lca is None:
+                break
+            lca = lca.common_ancestor(typex)
+        return lca
     for typex in type_list:
         node = typex
         while True:
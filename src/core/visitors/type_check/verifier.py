@@ -4,11 +4,16 @@ from ...cmp import cool_ast as cool, SemanticError
 
 # Type Verifier
 class TypeVerifier:
-    def __init__(self, context, errors=[]):
+    def __init__(self, context, errors=None):
         self.context = context
         self.current_type = None
-        self.errors = errors
+        self.errors = [] if errors is None else errors
     
+    def verify(self, methods):
+        # The (type, method) pairs some TypeChecker pass met, see TypeChecker.methods
+        for self.current_type, node in methods:
+            self.visit(node)
+
     @visitor.on('node')
     def visit(self, node):
         pass
@@ -21,6 +21,7 @@
 # THE SOFTWARE.
 
 import inspect
+from types import MethodType
 
 __all__ = ['on', 'when']
 
@@ -39,13 +40,14 @@ def when(param_type):
     if not isinstance(dispatcher, Dispatcher):
       dispatcher = dispatcher.dispatcher
     dispatcher.add_target(param_type, fn)
-    def ff(*args, **kw):
-      return dispatcher(*args, **kw)
-    ff.dispatcher = dispatcher
-    return ff
+    return dispatcher
   return f
 
 
+def unhandled(*args, **kw):
+  return []
+
+
 class Dispatcher(object):
   def __init__(self, param_name, fn):
     frame = inspect.currentframe().f_back.f_back
@@ -53,23 +55,45 @@ class Dispatcher(object):
     self.param_index = self.__argspec(fn).args.index(param_name)
     self.param_name = param_name
     self.targets = {}
+    # Handler of each class seen so far, filled on first use
+    self.handlers = {}
+
+  def __get__(self, instance, owner):
+    # Bound like a method, so visitors call the dispatcher without a wrapper in between
+    if instance is None:
+      return self
+    return MethodType(self, instance)
 
   def __call__(self, *args, **kw):
     typ = args[self.param_index].__class__
-    d = self.targets.get(typ)
-    if d is not None:
-      return d(*args, **kw)
-    else:
-      issub = issubclass
-      t = self.targets
-      ks = t.keys()
-      ans = [t[k](*args, **kw) for k in ks if issub(typ, k)]
-      if len(ans) == 1:
-        return ans.pop()
-      return ans
+    try:
+      handler = self.handlers[typ]
+    except KeyError:
+      if not self.handlers:
+        self.prepare()
+      handler = self.handlers[typ] = self.resolve(typ)
+    return handler(*args, **kw)
 
   def add_target(self, typ, target):
     self.targets[typ] = target
+    self.handlers.clear()
+
+  def resolve(self, typ):
+    # The most specific class in typ.__mro__ with a target wins, the targets of
+    # its bases don't run as well. Classes without any target get []
+    for base in typ.__mro__:
+      target = self.targets.get(base)
+      if target is not None:
+        return target
+    return unhandled
+
+  def prepare(self):
+    pending = list(self.targets)
+    while pending:
+      typ = pending.pop()
+      if typ not in self.handlers:
+        self.handlers[typ] = self.resolve(typ)
+        pending.extend(typ.__subclasses__())
 
   @staticmethod
   def __argspec(fn):
@@ -1,111 +1,308 @@
-from sys import exit
+import io
+import os
+from sys import exit, stderr
+from itertools import chain
+from contextlib import redirect_stdout
+from concurrent.futures import ProcessPoolExecutor
 
-from core.cmp import evaluate_reverse_parse, CoolParser
+from core.cmp import CoolParser, EOF
+from core.cmp.cool.parser import ALGORITHM
 
-from core import CoolLexer
-from core import TypeBuilder, TypeCollector, TypeVerifier, InferenceVisitor, COOLToCILVisitor, CILToMIPSVisitor
+from core import CoolLexer, timings
+from core.lexer import read_source
+from core import SemanticAnalyzer, COOLToCILVisitor, CILToMIPSVisitor, CodeUnits, RuntimeLibrary
 from core import PrintVisitor, FormatVisitor, get_formatter
+from artifacts import ArtifactCache, CACHE_DIR, DEFAULT_CACHE_DIR
 
-def main(args):
-    # Read code
-    try:
-        with open(args.file, 'r') as fd:
-            code = fd.read()
-    except:
-        print(f"(0,0) - CompilerError: file {args.file} not found")
-        exit(1)
-    
-    # Lexer
-    lexer = CoolLexer()
-    
-    # Tokenize
-    tokens = lexer.tokenize(code)
-
-    if len(tokens) == 1 and tokens[0].lex == '$':
-        print("(0, 0) - SyntacticError: Unexpected token EOF") 
-        exit(1)
-
-    lexer_err = False
-    for token in tokens:
-        if token.token_type == "ERROR":
-            lexer_err = True
-            print(token.lex)
-    
-    if lexer_err:
-        exit(1)
+RUNTIME_LIB = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'core', 'visitors', 'mips', 'mips_lib.asm')
+
+# Buffer of the files the assembly is streamed to
+WRITE_BUFFER = 1024 * 1024
+
+_runtime = None
+
+def read_runtime():
+    """The runtime library, split in routines linked after each program as needed (read once per process)"""
+    global _runtime
+    if _runtime is None:
+        with open(RUNTIME_LIB, 'rb') as f:
+            _runtime = RuntimeLibrary(f.read())
+    return _runtime
+
+def compile_file(file, lexer, runtime=None, use_mmap=False, cache=None):
+    """
+    Compile `file` into a .mips file next to it, printing the errors found.
+    Returns the exit code of the compilation.
+
+    The lexer (and the runtime library, if given) can be shared among
+    many compilations. If an ArtifactCache is given, it's checked before
+    compiling and the result is stored there. On a miss, the code of the
+    classes that didn't change is taken from it too.
+    """
+    with timings.recording(file):
+        # Read code
+        try:
+            with timings.phase('read'):
+                code = read_source(file, use_mmap)
+        except:
+            print(f"(0,0) - CompilerError: file {file} not found")
+            return 1
+
+        out_file = file.split(".")
+        out_file[-1] = "mips"
+        out_file = ".".join(out_file)
 
-    # Parse
-    parsedData, (failure, token) = CoolParser(tokens, get_shift_reduce=True)
+        if runtime is None:
+            runtime = read_runtime()
+
+        if cache is None:
+            status, program = compile_source(code, lexer)
+            if program is not None:
+                write_assembly(out_file, program, runtime)
+            return status
+
+        with timings.phase('cache'):
+            key = cache.key(code, runtime.text, { 'parser': ALGORITHM, 'lexer': lexer.backend })
+            entry = cache.get(key)
+
+        if entry is None:
+            output = io.StringIO()
+            assembly, routines = None, None
+            with redirect_stdout(output):
+                status, program = compile_source(code, lexer)
+                if program is not None:
+                    size, routines = write_assembly(out_file, program, runtime, cache.units())
+                    # The assembly went straight to the file, take it back from there
+                    with timings.phase('cache'), open(out_file, 'rb') as f:
+                        assembly = f.read(size)
+            entry = (status, output.getvalue(), assembly, routines)
+            with timings.phase('cache'):
+                cache.put(key, entry)
+            print(entry[1], end='')
+            return status
+
+        status, output, assembly, routines = entry
+        print(output, end='')
+        if assembly is not None:
+            with timings.phase('write'), open(out_file, 'wb') as f:
+                f.write(assembly)
+                f.write(runtime.link(routines))
+        return status
+
+def compile_source(code, lexer):
+    """
+    Run the compilation phases over `code` up to CIL, printing the errors
+    found. Returns the exit code and the CIL program (None on errors), see
+    `write_assembly` for the rest.
+    """
+    # Tokenize (lazily, the parser pulls the tokens as it needs them)
+    tokens = timings.timed('lex', lexer.iter_tokens(code))
+    with timings.phase('parse'):
+        first = next(tokens)
+
+        if isinstance(first.token_type, EOF):
+            print("(0, 0) - SyntacticError: Unexpected token EOF") 
+            return 1, None
+
+        # Parse and build the AST
+        ast, (failure, token) = CoolParser(chain([first], tokens), evaluate=True)
     
     if failure:
+        # The parser stops at the first lexer error, but all of them
+        # must be reported (before any syntactic error)
+        lexer_err = False
+        for current in chain([token], tokens):
+            if current.token_type == "ERROR":
+                lexer_err = True
+                print(current.lex)
+
+        if lexer_err:
+            return 1, None
+
         print(f"({token.row},{token.column}) - SyntacticError: Unexpected token {token.lex}")
-        exit(1)
-
-    # AST
-    parse, operations = parsedData
-    ast = evaluate_reverse_parse(parse, operations, tokens)
-    errors = []
-
-    # Collect user types
-    collector = TypeCollector()
-    collector.visit(ast)
-    context = collector.context
-    errors.extend(collector.errors)
-
-    # Building types
-    builder = TypeBuilder(context)
-    builder.visit(ast)
-    errors.extend(builder.errors)
-
-    # Checking types
-    inferencer = InferenceVisitor(context)
-    while inferencer.visit(ast)[0]: pass
-    inferencer.errors.clear()
-    _, scope = inferencer.visit(ast)
-    errors.extend(inferencer.errors)
-
-    verifier = TypeVerifier(context)
-    verifier.visit(ast)
-    for e in verifier.errors:
-        if not e in errors:
-            errors.append(e)
-    
+        return 1, None
+
+    # Declare, check and infer the types
+    analyzer = SemanticAnalyzer()
+    errors = analyzer.analyze(ast)
+    context, scope = analyzer.context, analyzer.scope
+
     if errors:
         for (ex, token) in errors:
             print(f"({token.row},{token.column}) - {type(ex).__name__}: {str(ex)}")
-        exit(1)
+        return 1, None
     # else:
     #     print(FormatVisitor().visit(ast))
 
     #CIL Transformation
-    cool_to_cil = COOLToCILVisitor(context)
-    cil_ast = cool_to_cil.visit(ast, scope)
+    with timings.phase('cil'):
+        cool_to_cil = COOLToCILVisitor(context)
+        cil_ast = cool_to_cil.visit(ast, scope)
     # formatter = get_formatter()
     # ast_cil = formatter(cil_ast)
     # print(ast_cil)
 
-    cil_to_mips = CILToMIPSVisitor()
-    mips_ast = cil_to_mips.visit(cil_ast)
-    printer = PrintVisitor()
-    mips_code = printer.visit(mips_ast)
+    return 0, cil_ast
 
-    out_file = args.file.split(".")
-    out_file[-1] = "mips"
-    out_file = ".".join(out_file)
+def write_assembly(path, program, runtime, units=None):
+    """
+    Translate the CIL `program` to MIPS into the file `path`, followed by
+    the routines of the runtime library it reaches. Returns the size in
+    bytes of the program's code and the names of those routines.
 
-    with open(out_file, 'w') as f:
-        f.write(mips_code)
-        with open("./core/visitors/mips/mips_lib.asm") as f2:
-            f.write("".join(f2.readlines()))
-    
-    exit(0)
+    Functions are translated, printed and written one at a time, so the
+    memory used grows with the largest function, not with the program.
+    With a cache of `units`, only the classes whose code (or the layout of
+    the types it uses) changed since it was stored are translated.
+    """
+    try:
+        with timings.phase('emit'), open(path, 'w', buffering=WRITE_BUFFER) as f:
+            if units is None:
+                cil_to_mips = CILToMIPSVisitor()
+                PrintVisitor().write(cil_to_mips.stream(program), f)
+                calls = cil_to_mips.runtime_calls
+            else:
+                calls = CodeUnits(units).write(program, f)
+            routines = runtime.closure(calls)
+            f.flush()
+            size = f.buffer.tell()
+            f.buffer.write(runtime.link(routines))
+    except:
+        # Don't leave half a program behind
+        if os.path.exists(path):
+            os.remove(path)
+        raise
+    return size, routines
+
+def expand_paths(paths):
+    # Directories stand for all the .cl files inside them
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, names in os.walk(path):
+                dirs.sort()
+                for name in sorted(names):
+                    if name.endswith('.cl'):
+                        yield os.path.join(root, name)
+        else:
+            yield path
+
+def compile_reporting(file, lexer, runtime=None, use_mmap=False, cache=None):
+    # Like compile_file, but a crash only fails this file
+    try:
+        return compile_file(file, lexer, runtime, use_mmap, cache)
+    except Exception as e:
+        print(f"(0,0) - CompilerError: {type(e).__name__}: {e}")
+        return 1
+
+# Lexer, runtime library and artifact cache of each worker process, set once by `init_worker`
+worker = {}
+
+def cache_dir(args):
+    # The cache is opt-in: COOL_ARTIFACT_CACHE names its directory, --cache takes the default one
+    if args.no_cache:
+        return None
+    return CACHE_DIR or (DEFAULT_CACHE_DIR if args.cache else None)
+
+def open_cache(path=None):
+    return ArtifactCache(path) if path else None
+
+def init_worker(cache_path=None):
+    worker['lexer'] = CoolLexer()
+    worker['runtime'] = read_runtime()
+    worker['cache'] = open_cache(cache_path)
+
+def compile_in_worker(file, use_mmap=False):
+    output = io.StringIO()
+    with redirect_stdout(output):
+        status = compile_reporting(file, worker['lexer'], worker['runtime'], use_mmap, worker['cache'])
+    return status, output.getvalue()
+
+def compile_timed_in_worker(file, use_mmap=False, memory=True):
+    # Timings hooks live in the parent process, hand it the records
+    records = []
+    hook = records.append
+    timings.add_hook(hook, memory)
+    try:
+        status, output = compile_in_worker(file, use_mmap)
+    finally:
+        timings.remove_hook(hook)
+    return status, output, records
+
+def compile_batch(paths, use_mmap=False, jobs=1, cache_path=None):
+    """
+    Compile many files in this process, sharing the lexer, the parser
+    and the runtime library. Each file reports its errors followed by a
+    status line, and the result is 1 if any of them failed.
+
+    With `jobs > 1` the files are spread among that many worker
+    processes, which start from the parser tables already built. Their
+    reports are still printed in the order of the files. Artifacts are
+    cached in `cache_path`, if given.
+    """
+    files = list(expand_paths(paths))
+
+    if jobs > 1 and len(files) > 1:
+        pool = ProcessPoolExecutor(min(jobs, len(files)), initializer=init_worker, initargs=(cache_path,))
+        chunksize = max(1, len(files) // (jobs * 8))
+        if timings.enabled():
+            memory = [timings.tracing_memory()] * len(files)
+            results = pool.map(compile_timed_in_worker, files, [use_mmap] * len(files), memory, chunksize=chunksize)
+        else:
+            results = pool.map(compile_in_worker, files, [use_mmap] * len(files), chunksize=chunksize)
+    else:
+        pool = None
+        init_worker(cache_path)
+        results = (compile_in_worker(file, use_mmap) for file in files)
+
+    failed = 0
+    try:
+        for file, (status, output, *records) in zip(files, results):
+            for record in chain.from_iterable(records):
+                timings.emit(record)
+            print(output, end='')
+            print(f"{file}: {'ok' if status == 0 else 'failed'}")
+            failed += status != 0
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    print(f"{len(files) - failed} of {len(files)} files compiled")
+    return 1 if failed else 0
+
+def main(args):
+    cache_path = cache_dir(args)
+    if args.cache_stats:
+        cache = open_cache(cache_path)
+        print(f"{cache.report()}\n\n{cache.units().report()}" if cache else "The artifact cache is disabled")
+        exit(0)
+    if args.timings:
+        records = []
+        timings.add_hook(records.append)
+
+    if not args.files:
+        status = compile_file(args.file, CoolLexer(), use_mmap=args.mmap, cache=open_cache(cache_path))
+    else:
+        status = compile_batch(args.files, args.mmap, args.jobs or os.cpu_count(), cache_path)
+
+    if args.timings:
+        print(timings.report(timings.merge(records), args.timings_format), file=stderr)
+    exit(status)
 
 
 if __name__ == "__main__":
     import argparse 
 
     parser = argparse.ArgumentParser(description='CoolCompiler pipeline')
+    parser.add_argument('files', nargs='*', help='files or directories to compile in a single batch')
     parser.add_argument('-f', '--file', type=str, default='code.cl', help='file to read')
+    parser.add_argument('-j', '--jobs', type=int, default=1, help='worker processes for batches (0 for one per core)')
+    parser.add_argument('-m', '--mmap', action='store_true', help='read the file through a memory map')
+    caching = parser.add_mutually_exclusive_group()
+    caching.add_argument('--cache', action='store_true', help=f'cache artifacts in $COOL_ARTIFACT_CACHE, or else in {os.path.relpath(DEFAULT_CACHE_DIR)}')
+    caching.add_argument('--no-cache', action='store_true', help='compile without looking up or storing artifacts, even if $COOL_ARTIFACT_CACHE is set')
+    parser.add_argument('--cache-stats', action='store_true', help='show the statistics of the artifact cache and exit')
+    parser.add_argument('--timings', action='store_true', help='report time, calls and peak memory of each phase on stderr (tracing memory slows the compilation down)')
+    parser.add_argument('--timings-format', choices=['text', 'json'], default='text', help='format of the --timings report')
 
     args = parser.parse_args()
     main(args)
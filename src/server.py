@@ -0,0 +1,114 @@
+"""
+Compile server keeping the compiler warm between compilations.
+
+Listens on a Unix socket for requests, one per connection, each a JSON
+line `{"file": ..., "cwd": ..., "mmap": ...}`. The file is compiled by a
+pool of workers that already hold the parser tables, a lexer and the
+runtime library. The answer is a JSON line `{"output": ...}` with the
+messages of the compiler, `{"error": ...}` with its traceback if it
+crashed, and `{"status": ...}` with its exit code. If a request can't
+be served the connection is closed without a status, and client.py
+compiles the file by itself.
+
+The workers only cache artifacts if COOL_ARTIFACT_CACHE is set.
+
+The server doesn't notice changes on the compiler sources, restart it
+after editing them.
+"""
+import io
+import os
+import json
+import signal
+import socket
+import asyncio
+import traceback
+from sys import exit
+from contextlib import redirect_stdout
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from client import SOCKET
+from artifacts import CACHE_DIR
+from main import init_worker, worker, compile_file
+
+def compile_request(file, cwd, use_mmap):
+    # Workers serve a request at a time, so they can move to the directory
+    # of the client and resolve the path (and report it) just like main.py
+    os.chdir(cwd)
+    output, error = io.StringIO(), ''
+    try:
+        with redirect_stdout(output):
+            status = compile_file(file, worker['lexer'], worker['runtime'], use_mmap, worker['cache'])
+    except Exception:
+        # main.py would crash, leaving its traceback on stderr and exiting with 1
+        status, error = 1, traceback.format_exc()
+    return status, output.getvalue(), error
+
+def is_listening(path):
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(path)
+        except OSError:
+            return False
+    return True
+
+async def handle(reader, writer, pool, stop):
+    loop = asyncio.get_running_loop()
+    try:
+        message = json.loads(await reader.readline())
+        status, output, error = await loop.run_in_executor(pool, compile_request, message['file'], message['cwd'], bool(message.get('mmap')))
+        writer.write(json.dumps({ 'output': output }).encode() + b'\n')
+        if error:
+            writer.write(json.dumps({ 'error': error }).encode() + b'\n')
+        writer.write(json.dumps({ 'status': status }).encode() + b'\n')
+        await writer.drain()
+    except BrokenProcessPool:
+        # A worker died, stop serving and let the clients compile by themselves
+        stop.set()
+    except Exception:
+        pass
+    finally:
+        writer.close()
+
+async def serve(path, jobs):
+    loop = asyncio.get_running_loop()
+    stop = asyncio.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stop.set)
+
+    with ProcessPoolExecutor(jobs, initializer=init_worker, initargs=(CACHE_DIR,)) as pool:
+        # Start the workers now, so the first request doesn't wait for them
+        await asyncio.gather(*(loop.run_in_executor(pool, os.getpid) for _ in range(jobs)))
+
+        # Only this user may connect, the workers compile and write files on its behalf
+        umask = os.umask(0o077)
+        try:
+            server = await asyncio.start_unix_server(lambda r, w: handle(r, w, pool, stop), path)
+        finally:
+            os.umask(umask)
+        print(f'Listening on {path} with {jobs} workers', flush=True)
+        try:
+            async with server:
+                await stop.wait()
+        finally:
+            os.remove(path)
+
+def main(args):
+    if is_listening(args.socket):
+        print(f'A server is already listening on {args.socket}')
+        exit(1)
+    if os.path.exists(args.socket):
+        os.remove(args.socket)
+
+    asyncio.run(serve(args.socket, args.jobs or os.cpu_count()))
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='CoolCompiler server')
+    parser.add_argument('-s', '--socket', type=str, default=SOCKET, help='unix socket to listen on')
+    parser.add_argument('-j', '--jobs', type=int, default=0, help='worker processes (0 for one per core)')
+
+    args = parser.parse_args()
+    main(args)
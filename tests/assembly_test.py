@@ -0,0 +1,74 @@
+import pytest
+import io
+import os
+import re
+from glob import glob
+from contextlib import redirect_stdout
+
+from core import CoolLexer
+from artifacts import ArtifactCache
+from main import compile_source, write_assembly, read_runtime, RUNTIME_LIB
+from core.visitors.mips.runtime import RuntimeLibrary, ROUTINES, LABEL, code_of
+
+tests_dir = __file__.rpartition('/')[0] + '/codegen/'
+tests = sorted(os.path.basename(path) for path in glob(tests_dir + '*.cl'))
+
+# Shifts the labels (and, first, the types) of the rest of a program
+EXTRA = 'class Extra { x : Int <- 1; f() : String { if x = 1 then "one" else "other" fi }; };\n'
+
+# Label operand of jumps, branches, address loads and words of data
+REFERENCE = re.compile(rb'(?:jal|j|la|b[a-z]+|\.word)\s(?:.*[\s,])?([A-Za-z_]\w*)')
+
+@pytest.fixture(scope='module')
+def lexer():
+    return CoolLexer()
+
+def assemble(tmp_path, lexer, code, units=None):
+    with redirect_stdout(io.StringIO()):
+        status, program = compile_source(code, lexer)
+    assert status == 0
+    path = str(tmp_path / 'program.mips')
+    write_assembly(path, program, read_runtime(), units)
+    with open(path, 'rb') as fd:
+        return fd.read()
+
+@pytest.mark.codegen
+@pytest.mark.run(order=4)
+@pytest.mark.parametrize("cool_file", tests)
+def test_relinked_units(tmp_path, lexer, cool_file):
+    with open(tests_dir + cool_file) as fd:
+        code = fd.read()
+    units = ArtifactCache(str(tmp_path / 'units'))
+
+    # Generated, then reused as they are, then reused in programs laid out otherwise
+    for source in (code, code, EXTRA + code, code + EXTRA):
+        assert assemble(tmp_path, lexer, source, units) == assemble(tmp_path, lexer, source)
+    assert units.stats()['hits'] > 0
+
+@pytest.mark.codegen
+@pytest.mark.run(order=4)
+def test_runtime_library_relinks_whole():
+    with open(RUNTIME_LIB, 'rb') as fd:
+        text = fd.read()
+    runtime = RuntimeLibrary(text)
+    assert runtime.link(ROUTINES) == text
+    assert runtime.link([]) == runtime.preamble
+
+@pytest.mark.codegen
+@pytest.mark.run(order=4)
+@pytest.mark.parametrize("cool_file", tests)
+def test_labels_are_defined(tmp_path, lexer, cool_file):
+    with open(tests_dir + cool_file) as fd:
+        code = fd.read()
+    defined, used = set(), set()
+    for line in assemble(tmp_path, lexer, code).splitlines():
+        line = code_of(line)
+        match = LABEL.match(line)
+        if match:
+            defined.add(match.group(1))
+            continue
+        match = REFERENCE.fullmatch(line)
+        if match:
+            used.add(match.group(1))
+    assert used
+    assert used <= defined, f'undefined labels: {sorted(used - defined)}'
@@ -0,0 +1,96 @@
+import pytest
+import os
+import sys
+import json
+import shutil
+import subprocess
+from utils import run_main, SRC_DIR
+
+tests_dir = __file__.rpartition('/')[0] + '/'
+# Relative to the batch folder, in the order the batch compiles them
+sources = {
+    'arith.cl': 'codegen/arith.cl',
+    'fib.cl': 'codegen/fib.cl',
+    'sub/arithmetic1.cl': 'semantic/arithmetic1.cl',
+}
+NO_CACHE = { 'COOL_ARTIFACT_CACHE': '' }
+
+def make_batch(path):
+    for name, source in sources.items():
+        os.makedirs(os.path.dirname(str(path / name)), exist_ok=True)
+        shutil.copy(tests_dir + source, str(path / name))
+    # Only .cl files are compiled
+    shutil.copy(tests_dir + 'codegen/fib_input.txt', str(path / 'fib_input.txt'))
+    return str(path)
+
+def assembly(path):
+    mips = {}
+    for name in sources:
+        try:
+            with open(os.path.join(path, name[:-2] + 'mips'), 'rb') as fd:
+                mips[name] = fd.read()
+        except FileNotFoundError:
+            pass
+    return mips
+
+@pytest.mark.codegen
+@pytest.mark.run(order=4)
+def test_batch_as_single_files(tmp_path):
+    batch = make_batch(tmp_path / 'batch')
+    single = make_batch(tmp_path / 'single')
+
+    expected = ''
+    for name in sources:
+        status, output = run_main(['-f', os.path.join(single, name)], NO_CACHE)
+        expected += output + f"{os.path.join(batch, name)}: {'ok' if status == 0 else 'failed'}\n"
+    expected += '2 of 3 files compiled\n'
+
+    status, output = run_main([batch], NO_CACHE)
+    assert status == 1
+    assert output == expected
+    assert sorted(assembly(batch)) == ['arith.cl', 'fib.cl']
+    assert assembly(batch) == assembly(single)
+
+@pytest.mark.codegen
+@pytest.mark.run(order=4)
+def test_batch_of_files(tmp_path):
+    batch = make_batch(tmp_path)
+    files = [os.path.join(batch, 'fib.cl'), os.path.join(batch, 'arith.cl')]
+
+    status, output = run_main(files, NO_CACHE)
+    assert status == 0
+    assert output == f'{files[0]}: ok\n{files[1]}: ok\n2 of 2 files compiled\n'
+
+@pytest.mark.codegen
+@pytest.mark.run(order=4)
+def test_batch_in_workers(tmp_path):
+    serial = make_batch(tmp_path / 'serial')
+    parallel = make_batch(tmp_path / 'parallel')
+
+    status, output = run_main(['-j', '1', serial], NO_CACHE)
+    pstatus, poutput = run_main(['-j', '2', parallel], NO_CACHE)
+    assert pstatus == status == 1
+    assert poutput == output.replace(serial, parallel)
+    assert assembly(parallel) == assembly(serial)
+
+@pytest.mark.codegen
+@pytest.mark.run(order=4)
+def test_batch_timings(tmp_path):
+    batch = make_batch(tmp_path)
+    files = [os.path.join(batch, 'fib.cl'), os.path.join(batch, 'arith.cl')]
+
+    # Files right after --timings are still files
+    sp = subprocess.run([sys.executable, 'main.py', '--timings', '--timings-format', 'json'] + files,
+        cwd=SRC_DIR, capture_output=True, env={ **os.environ, **NO_CACHE })
+    assert sp.returncode == 0
+    assert sp.stdout.decode() == f'{files[0]}: ok\n{files[1]}: ok\n2 of 2 files compiled\n'
+    phases = json.loads(sp.stderr)['phases']
+    assert 'parse' in phases
+    # Every type-check visitor, and the printing of the assembly, on its own
+    for name, parent in [('collect', 'declare'), ('build', 'declare'), ('typecheck', 'check'), ('solve', 'check'),
+            ('verify', 'check'), ('print', 'emit'), ('mips', 'emit')]:
+        assert phases[name]['parent'] == parent
+
+    sp = subprocess.run([sys.executable, 'main.py', '--timings'] + files, cwd=SRC_DIR, capture_output=True, env={ **os.environ, **NO_CACHE })
+    assert sp.returncode == 0
+    assert b'parse' in sp.stderr
@@ -0,0 +1,132 @@
+import pytest
+import os
+import shutil
+from utils import run_main
+
+import artifacts
+from artifacts import ArtifactCache, DEFAULT_CACHE_DIR
+
+tests_dir = __file__.rpartition('/')[0] + '/'
+tests = ['codegen/fib.cl', 'semantic/arithmetic1.cl']
+
+def compile_with(path, cache, *args, **env):
+    """Exit code, output and assembly of compiling `path` with the artifact cache at `cache`"""
+    status, output = run_main(['-f', path] + list(args), { 'COOL_ARTIFACT_CACHE': cache, **env })
+    try:
+        with open(path[:-2] + 'mips', 'rb') as fd:
+            mips = fd.read()
+        os.remove(path[:-2] + 'mips')
+    except FileNotFoundError:
+        mips = None
+    return status, output, mips
+
+def lookups(cache):
+    stats = ArtifactCache(cache).stats()
+    return stats['misses'], stats['hits']
+
+@pytest.fixture
+def program(tmp_path, request):
+    path = str(tmp_path / os.path.basename(request.param))
+    shutil.copy(tests_dir + request.param, path)
+    return path
+
+@pytest.mark.codegen
+@pytest.mark.run(order=4)
+@pytest.mark.parametrize("program", tests, indirect=True)
+def test_cache_hit(tmp_path, program):
+    cache = str(tmp_path / 'cache')
+    uncached = compile_with(program, '')
+
+    assert compile_with(program, cache) == uncached
+    assert lookups(cache) == (1, 0)
+    assert compile_with(program, cache) == uncached
+    assert lookups(cache) == (1, 1)
+
+@pytest.mark.codegen
+@pytest.mark.run(order=4)
+@pytest.mark.parametrize("program", tests[:1], indirect=True)
+def test_cache_bypass(tmp_path, program):
+    cache = str(tmp_path / 'cache')
+    uncached = compile_with(program, '')
+    assert uncached[2] is not None
+
+    assert compile_with(program, cache, '--no-cache') == uncached
+    assert not os.path.exists(cache)
+
+    status, output = run_main(['--cache-stats'], { 'COOL_ARTIFACT_CACHE': '' })
+    assert output == 'The artifact cache is disabled\n'
+
+@pytest.mark.codegen
+@pytest.mark.run(order=4)
+@pytest.mark.parametrize("program", tests[:1], indirect=True)
+def test_cache_opt_in(tmp_path, program, monkeypatch):
+    monkeypatch.delenv('COOL_ARTIFACT_CACHE', raising=False)
+    uncached = compile_with(program, '')
+    before = lookups(DEFAULT_CACHE_DIR)
+
+    # Nothing is cached unless asked for
+    status, output = run_main(['-f', program])
+    assert status == uncached[0] and output == uncached[1]
+    assert lookups(DEFAULT_CACHE_DIR) == before
+    status, output = run_main(['--cache-stats'])
+    assert output == 'The artifact cache is disabled\n'
+
+    # --cache takes the default folder
+    status, output = run_main(['-f', program, '--cache'])
+    assert status == uncached[0] and output == uncached[1]
+    assert sum(lookups(DEFAULT_CACHE_DIR)) == sum(before) + 1
+    status, output = run_main(['--cache', '--cache-stats'])
+    assert output.startswith(f'cache: {DEFAULT_CACHE_DIR}\n')
+
+@pytest.mark.codegen
+@pytest.mark.run(order=4)
+@pytest.mark.parametrize("program", tests[:1], indirect=True)
+def test_cache_eviction(tmp_path, program):
+    cache = str(tmp_path / 'cache')
+    uncached = compile_with(program, '')
+
+    # Any entry is over the limit, each one is evicted as soon as it's stored
+    assert compile_with(program, cache, COOL_ARTIFACT_CACHE_SIZE='1') == uncached
+    stats = ArtifactCache(cache).stats()
+    assert (stats['stores'], stats['evictions'], stats['entries']) == (1, 1, 0)
+    assert compile_with(program, cache, COOL_ARTIFACT_CACHE_SIZE='1') == uncached
+    assert lookups(cache) == (2, 0)
+
+@pytest.mark.codegen
+@pytest.mark.run(order=4)
+@pytest.mark.parametrize("program", tests[:1], indirect=True)
+def test_cache_options(tmp_path, program):
+    cache = str(tmp_path / 'cache')
+    uncached = compile_with(program, '')
+
+    assert compile_with(program, cache) == uncached
+    # Other parser tables or lexer backend, other entries
+    assert compile_with(program, cache, COOL_PARSER_ALGORITHM='lr1') == uncached
+    assert compile_with(program, cache, COOL_LEXER_BACKEND='dfa') == uncached
+    assert lookups(cache) == (3, 0)
+    assert compile_with(program, cache, COOL_LEXER_BACKEND='dfa') == uncached
+    assert lookups(cache) == (3, 1)
+
+@pytest.mark.codegen
+@pytest.mark.run(order=4)
+def test_cache_key(tmp_path, monkeypatch):
+    # A copy of the compiler sources to edit
+    src = tmp_path / 'src'
+    shutil.copytree(os.path.join(artifacts.SRC_DIR, 'core'), str(src / 'core'),
+        ignore=shutil.ignore_patterns('__pycache__', '.cache'))
+    shutil.copy(os.path.join(artifacts.SRC_DIR, 'main.py'), str(src / 'main.py'))
+    monkeypatch.setattr(artifacts, 'SRC_DIR', str(src))
+
+    def key(code='class Main {};', runtime=b'runtime', options={ 'parser': 'lalr1' }):
+        monkeypatch.setattr(artifacts, '_compiler_version', None)
+        return ArtifactCache(str(tmp_path / 'cache')).key(code, runtime, options)
+
+    original = key()
+    assert key() == original
+    assert key(code='class Main { };') != original
+    assert key(runtime=b'runtime\n') != original
+    assert key(options={ 'parser': 'lr1' }) != original
+
+    with open(str(src / 'core' / 'visitors' / 'mips' / 'cil_to_mips.py'), 'a') as fd:
+        fd.write('\n')
+    assert key() != original
@@ -0,0 +1,149 @@
+import pytest
+import os
+import sys
+import json
+import shutil
+import socket
+import subprocess
+import threading
+from contextlib import contextmanager
+from utils import run_main, SRC_DIR
+
+import client
+
+tests_dir = __file__.rpartition('/')[0] + '/'
+tests = ['codegen/fib.cl', 'semantic/arithmetic1.cl']
+NO_CACHE = { 'COOL_ARTIFACT_CACHE': '' }
+
+# Crashes the type inference, with a traceback on stderr and nothing on stdout
+CRASH = 'class Main inherits IO {\n\tmain(): IO { out_int(pick(true)) };\n\tpick(b : AUTO_TYPE) : Int { if b then 1 else 2 fi };\n};\n'
+
+def compile_both(tmp_path, cool_file, socket_path):
+    """Exit code, output and assembly of client.py and of main.py for `cool_file`"""
+    results = []
+    for script in ('client.py', 'main.py'):
+        path = str(tmp_path / script[:-3] / os.path.basename(cool_file))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        shutil.copy(os.path.join(tests_dir, cool_file), path)
+        status, output = run_main(['-f', path], { 'COOL_SERVER_SOCKET': socket_path, **NO_CACHE }, script)
+        try:
+            with open(path[:-2] + 'mips', 'rb') as fd:
+                mips = fd.read()
+        except FileNotFoundError:
+            mips = None
+        results.append((status, output, mips))
+    return results
+
+@contextmanager
+def running_server(path):
+    server = subprocess.Popen([sys.executable, 'server.py', '-s', path, '-j', '1'], cwd=SRC_DIR,
+        stdout=subprocess.PIPE, env={ **os.environ, **NO_CACHE })
+    try:
+        assert server.stdout.readline().startswith(b'Listening on')
+        yield server
+    finally:
+        server.terminate()
+        server.wait(10)
+
+def serve_once(path, replies):
+    # A server answering a single request with `replies`
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.bind(path)
+    sock.listen(1)
+
+    def answer():
+        with sock:
+            conn, _ = sock.accept()
+            with conn, conn.makefile('rb') as stream:
+                stream.readline()
+                for reply in replies:
+                    conn.sendall(json.dumps(reply).encode() + b'\n')
+
+    thread = threading.Thread(target=answer, daemon=True)
+    thread.start()
+    return thread
+
+@pytest.mark.codegen
+@pytest.mark.run(order=4)
+@pytest.mark.parametrize("cool_file", tests)
+def test_client_without_server(tmp_path, cool_file):
+    by_client, by_main = compile_both(tmp_path, cool_file, str(tmp_path / 'missing.sock'))
+    assert by_client == by_main
+
+@pytest.mark.codegen
+@pytest.mark.run(order=4)
+def test_client_ignores_other_files(tmp_path):
+    path = tmp_path / 'coolc.sock'
+    path.write_text('{"output": "forged\\n"}\n{"status": 0}\n')
+    by_client, by_main = compile_both(tmp_path, tests[1], str(path))
+    assert by_client == by_main
+
+@pytest.mark.codegen
+@pytest.mark.run(order=4)
+def test_client_when_server_hangs_up(tmp_path):
+    path = str(tmp_path / 'coolc.sock')
+    # An answer without a status is incomplete
+    server = serve_once(path, [{ 'output': 'partial\n' }])
+    by_client, by_main = compile_both(tmp_path, tests[1], path)
+    server.join(10)
+    assert by_client == by_main
+
+@pytest.mark.codegen
+@pytest.mark.run(order=4)
+def test_client_prints_server_answer(tmp_path):
+    path = str(tmp_path / 'coolc.sock')
+    server = serve_once(path, [{ 'output': 'served\n' }, { 'status': 3 }])
+    status, output = run_main(['-f', 'code.cl'], { 'COOL_SERVER_SOCKET': path }, 'client.py')
+    server.join(10)
+    assert (status, output) == (3, 'served\n')
+
+@pytest.mark.codegen
+@pytest.mark.run(order=4)
+@pytest.mark.parametrize("cool_file", tests)
+def test_client_with_server(tmp_path, cool_file):
+    path = str(tmp_path / 'coolc.sock')
+    with running_server(path):
+        assert client.is_trusted(path)
+        assert os.stat(path).st_mode & 0o077 == 0
+        by_client, by_main = compile_both(tmp_path, cool_file, path)
+        assert by_client == by_main
+
+@pytest.mark.codegen
+@pytest.mark.run(order=4)
+def test_client_when_compiler_crashes(tmp_path):
+    cool_file = tmp_path / 'crash.cl'
+    cool_file.write_text(CRASH)
+    path = str(tmp_path / 'coolc.sock')
+    with running_server(path):
+        by_client, by_main = compile_both(tmp_path, str(cool_file), path)
+        assert by_client == by_main == (1, '', None)
+
+        # Both tracebacks end in the same error, the one of the client comes from the server
+        tracebacks = []
+        for script in ('client.py', 'main.py'):
+            sp = subprocess.run([sys.executable, script, '-f', str(cool_file)], cwd=SRC_DIR, capture_output=True,
+                env={ **os.environ, 'COOL_SERVER_SOCKET': path, **NO_CACHE })
+            assert sp.stderr.startswith(b'Traceback (most recent call last):')
+            tracebacks.append(sp.stderr.splitlines())
+        assert tracebacks[0][-1] == tracebacks[1][-1]
+        assert any(b'server.py' in line for line in tracebacks[0])
+
+@pytest.mark.codegen
+@pytest.mark.run(order=4)
+def test_client_trusts_own_sockets_only(tmp_path, monkeypatch):
+    path = str(tmp_path / 'coolc.sock')
+    server = serve_once(path, [{ 'output': 'served\n' }, { 'status': 0 }])
+
+    link = str(tmp_path / 'link.sock')
+    os.symlink(path, link)
+    assert not client.is_trusted(link)
+    assert client.request({}, link) is None
+
+    with monkeypatch.context() as patch:
+        patch.setattr(os, 'getuid', lambda uid=os.getuid(): uid + 1)
+        assert not client.is_trusted(path)
+        assert client.request({}, path) is None
+
+    assert client.is_trusted(path)
+    assert client.request({}, path) == [{ 'output': 'served\n' }, { 'status': 0 }]
+    server.join(10)
@@ -1,5 +1,9 @@
 import pytest
+import sys
 import os
+from utils import SRC_DIR
+
+sys.path.insert(0, SRC_DIR)
 
 @pytest.fixture
 def compiler_path():
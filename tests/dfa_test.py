@@ -0,0 +1,23 @@
+import pytest
+from glob import glob
+
+from core import CoolLexer
+
+tests_dir = __file__.rpartition('/')[0] + '/'
+tests = sorted(path[len(tests_dir):] for path in glob(tests_dir + '**/*.cl', recursive=True))
+
+@pytest.fixture(scope='module')
+def lexers():
+    return CoolLexer('ply'), CoolLexer('dfa')
+
+def tokens(lexer, text):
+    return [(token.lex, str(token.token_type), token.row, token.column) for token in lexer.iter_tokens(text)]
+
+@pytest.mark.lexer
+@pytest.mark.run(order=1)
+@pytest.mark.parametrize("cool_file", tests)
+def test_dfa_tokens_as_ply(lexers, cool_file):
+    with open(tests_dir + cool_file) as fd:
+        text = fd.read()
+    ply, dfa = lexers
+    assert tokens(dfa, text) == tokens(ply, text)
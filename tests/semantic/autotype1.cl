@@ -0,0 +1,7 @@
+--A variable declared AUTO_TYPE cannot be both its Int initialization and the String argument it is used as.
+
+class Main inherits IO {
+	main(): IO {
+		let x : AUTO_TYPE <- 1 + 2 in out_string(x)
+	};
+};
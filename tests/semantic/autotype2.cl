@@ -0,0 +1,7 @@
+--The Int a method declared AUTO_TYPE returns cannot be used where a String is expected.
+
+class Main inherits IO {
+	main(): IO { out_string("Hello ".concat(count(3))) };
+
+	count(n : Int) : AUTO_TYPE { if n = 0 then 0 else 1 + count(n - 1) fi };
+};
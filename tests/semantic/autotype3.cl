@@ -0,0 +1,8 @@
+--The type a later method infers for the initialization of an attribute declared AUTO_TYPE must conform to its uses.
+
+class Main inherits IO {
+	name : AUTO_TYPE <- make();
+	main(): IO { out_int(name) };
+
+	make() : AUTO_TYPE { "Main".concat(" object") };
+};
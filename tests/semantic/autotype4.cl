@@ -0,0 +1,9 @@
+--An attribute declared AUTO_TYPE that a chain of later methods infers as Int cannot be used as a String.
+
+class Main inherits IO {
+	first : AUTO_TYPE <- second();
+	main(): IO { out_string(first) };
+
+	second() : AUTO_TYPE { third() };
+	third() : AUTO_TYPE { let n : Int <- 3 in n * n };
+};
@@ -0,0 +1,13 @@
+--An Int inferred in a class declared later reaches, through its callers, a String argument of Main.
+
+class Main inherits IO {
+	main(): IO { out_string(new A.g()) };
+};
+
+class A {
+	g() : AUTO_TYPE { let y : AUTO_TYPE <- new B.h() in y };
+};
+
+class B {
+	h() : AUTO_TYPE { 2 };
+};
@@ -0,0 +1,62 @@
+import pytest
+import os
+from glob import glob
+
+from core import CoolLexer
+from core.cmp.cool.grammar import CoolGrammar
+from core.cmp.parser import LR1Parser, LALR1Parser
+from core.cmp.parser.cache import read_cache, write_cache, dump_tables
+
+tests_dir = __file__.rpartition('/')[0] + '/'
+tests = sorted(path[len(tests_dir):] for path in glob(tests_dir + '*/*.cl'))
+
+@pytest.fixture(scope='module')
+def parsers():
+    # Built from scratch, loading them from the cache would hide a broken construction
+    return { LR1Parser: LR1Parser(CoolGrammar), LALR1Parser: LALR1Parser(CoolGrammar) }
+
+def parse(parser, text):
+    output, (failure, token) = parser(CoolLexer().iter_tokens(text))
+    if failure:
+        # LALR(1) may reduce a few more times before finding the error, but on the same token
+        return token.lex, token.row, token.column
+    return [str(production) for production in output]
+
+def tables(parser):
+    # The cells are sets, compare them regardless of their order
+    return { kind: { state: { symbol: sorted(values, key=str) for symbol, values in row.items() }
+        for state, row in rows.items() } if isinstance(rows, dict) else rows
+        for kind, rows in dump_tables(parser).items() }
+
+@pytest.mark.parser
+@pytest.mark.run(order=2)
+def test_tables_have_no_conflicts(parsers):
+    assert all(parser.ok for parser in parsers.values())
+
+@pytest.mark.parser
+@pytest.mark.run(order=2)
+@pytest.mark.parametrize("cool_file", tests)
+def test_lalr1_parses_as_lr1(parsers, cool_file):
+    with open(tests_dir + cool_file) as fd:
+        text = fd.read()
+    assert parse(parsers[LALR1Parser], text) == parse(parsers[LR1Parser], text)
+
+@pytest.mark.parser
+@pytest.mark.run(order=2)
+@pytest.mark.parametrize("algorithm", [LR1Parser, LALR1Parser])
+def test_stale_tables_are_rebuilt(tmp_path, parsers, algorithm):
+    path = str(tmp_path / 'cool.tables')
+    fresh = tables(parsers[algorithm])
+    other, = [parser for key, parser in parsers.items() if key is not algorithm]
+
+    # Tables of another grammar (here, of the other algorithm) are never loaded
+    write_cache(path, 'stale', dump_tables(other))
+    assert tables(algorithm(CoolGrammar, cache=path)) == fresh
+    assert read_cache(path, parsers[algorithm].fingerprint) is not None
+
+    # The rebuilt tables are the ones loaded next time
+    assert tables(algorithm(CoolGrammar, cache=path)) == fresh
+
+    with open(path, 'wb') as fd:
+        fd.write(b'not a pickle')
+    assert tables(algorithm(CoolGrammar, cache=path)) == fresh
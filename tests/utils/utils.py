@@ -1,5 +1,10 @@
 import subprocess
+import sys
 import re
+import os
+
+# Sources of the compiler, the tests of its parts import them from there
+SRC_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'src'))
 
 
 COMPILER_TIMEOUT = 'El compilador tarda mucho en responder.'
@@ -13,6 +18,15 @@ UNEXPECTED_OUTPUT = 'La salida de %s no es la esperada:\n%s\nEsperada:\n%s'
 
 ERROR_FORMAT = r'^\s*\(\s*(\d+)\s*,\s*(\d+)\s*\)\s*-\s*(\w+)\s*:(.*)$'
 
+def run_main(args, env=None, script='main.py', timeout=100):
+    """Run `script` of the compiler with `args` from its sources, returns its exit code and output"""
+    try:
+        sp = subprocess.run([sys.executable, script] + args, cwd=SRC_DIR, capture_output=True, timeout=timeout,
+            env=None if env is None else {**os.environ, **env})
+    except subprocess.TimeoutExpired:
+        assert False, COMPILER_TIMEOUT
+    return sp.returncode, sp.stdout.decode()
+
 def parse_error(error: str):
     merror = re.fullmatch(ERROR_FORMAT, error)
     assert merror, BAD_ERROR_FORMAT % error